@@ -20,6 +20,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portfolios.middleware.QueryTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -50,13 +51,84 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'portfolio_management.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+DATABASE_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'portfolios'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            # detrás de PgBouncer en modo transaction los cursores del lado del servidor no sobreviven entre transacciones
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER') == 'pgbouncer',
+        }
+    }
+elif DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+else:
+    raise ValueError(f"DB_ENGINE no soportado: {DATABASE_ENGINE}")
+
+# PRAGMAs aplicados a cada conexión SQLite nueva (WAL permite leer mientras se recalcula)
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
 }
 
+# en PostgreSQL las cargas de precios y holdings con al menos estas filas usan COPY
+POSTGRES_COPY_MIN_ROWS = int(os.environ.get('POSTGRES_COPY_MIN_ROWS', 1000))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'portfolios-default',
+    },
+    'api': {
+        'BACKEND': os.environ.get('API_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('API_CACHE_LOCATION', 'portfolios-api'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('API_CACHE_MAX_ENTRIES', 256)),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+PORTFOLIO_DATA_VERSION_FILE = BASE_DIR / '.data_version'
+
+PRICE_STALENESS_DAYS = int(os.environ.get('PRICE_STALENESS_DAYS', 5))
+
+HOLDINGS_NUMERIC_BACKEND = os.environ.get('HOLDINGS_NUMERIC_BACKEND', 'fixed')
+
+PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', BASE_DIR / '.price_store')
+PRICE_VERSION_FILE = BASE_DIR / '.price_version'
+
+ANALYTICS_WINDOW = int(os.environ.get('ANALYTICS_WINDOW', 21))
+# vacío: se deduce del espaciado de las fechas (365 con la serie diaria de calendario de la planilla)
+ANALYTICS_PERIODS_PER_YEAR = float(os.environ['ANALYTICS_PERIODS_PER_YEAR']) if os.environ.get('ANALYTICS_PERIODS_PER_YEAR') else None
+ANALYTICS_RISK_FREE_RATE = float(os.environ.get('ANALYTICS_RISK_FREE_RATE', 0))
+# los jobs load_data solo leen archivos dentro de este directorio
+JOB_DATA_DIR = os.environ.get('JOB_DATA_DIR', BASE_DIR / 'data')
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY_SECONDS = int(os.environ.get('JOB_RETRY_DELAY_SECONDS', 30))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get('JOB_HEARTBEAT_SECONDS', 30))
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', 900))
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 2))
+SLOW_QUERY_MS = float(os.environ['SLOW_QUERY_MS']) if os.environ.get('SLOW_QUERY_MS') else None
+
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
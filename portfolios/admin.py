@@ -1,9 +1,12 @@
 from django.contrib import admin
-from .models import Asset, Portfolio, AssetPrice, PortfolioWeight, PortfolioHolding, Transaction
+from .models import Asset, Portfolio, AssetPrice, PortfolioWeight, InitialQuantity, PortfolioHolding, PortfolioValue, Transaction, Job
 
 admin.site.register(Asset)
 admin.site.register(Portfolio)
 admin.site.register(AssetPrice)
 admin.site.register(PortfolioWeight)
+admin.site.register(InitialQuantity)
 admin.site.register(PortfolioHolding)
+admin.site.register(PortfolioValue)
 admin.site.register(Transaction)
+admin.site.register(Job)
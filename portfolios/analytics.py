@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from numpy.lib.stride_tricks import sliding_window_view
+from .metrics import record_rows
+
+
+def rounded(value, digits=8):
+    return None if value is None or not np.isfinite(value) else round(float(value), digits)
+
+
+def rolling_volatility(returns, window, periods):
+    if len(returns) < window:
+        return np.full(len(returns), np.nan)
+    volatility = sliding_window_view(returns, window).std(axis=1, ddof=1) * np.sqrt(periods)
+    return np.concatenate([np.full(window - 1, np.nan), volatility])
+
+
+def drawdowns(values):
+    peaks = np.maximum.accumulate(values)
+    return values / peaks - 1
+
+
+def periods_per_year(dates):
+    # observaciones por año según las fechas de la serie: 365 si es diaria de calendario, ~261 si son días hábiles
+    days = (dates[-1] - dates[0]).days
+    return (len(dates) - 1) * 365 / days if days > 0 else 365
+
+
+def series_analytics(dates, values, window, risk_free=None, periods=None, include_series=False):
+    risk_free = settings.ANALYTICS_RISK_FREE_RATE if risk_free is None else risk_free
+    periods = settings.ANALYTICS_PERIODS_PER_YEAR if periods is None else periods
+    periods = periods_per_year(dates) if periods is None else periods
+    returns = values[1:] / values[:-1] - 1
+    cumulative = values / values[0] - 1
+    drawdown = drawdowns(values)
+    trough = int(np.argmin(drawdown))
+    peak = int(np.argmax(values[:trough + 1]))
+    volatility = returns.std(ddof=1) if len(returns) > 1 else np.nan
+    excess = returns.mean() - risk_free / periods if len(returns) else np.nan
+    rolling = rolling_volatility(returns, window, periods)
+    years = len(returns) / periods
+    result = {
+        'start': dates[0],
+        'end': dates[-1],
+        'observations': len(values),
+        'periods_per_year': rounded(periods, 2),
+        'last_value': rounded(values[-1], 2),
+        'last_daily_return': rounded(returns[-1]) if len(returns) else None,
+        'total_return': rounded(cumulative[-1]),
+        'annualized_return': rounded((1 + cumulative[-1]) ** (1 / years) - 1) if years else None,
+        'mean_daily_return': rounded(returns.mean()) if len(returns) else None,
+        'daily_volatility': rounded(volatility),
+        'volatility': rounded(volatility * np.sqrt(periods)),
+        'rolling_volatility': rounded(rolling[-1]) if len(rolling) else None,
+        'sharpe': rounded(excess / volatility * np.sqrt(periods)) if volatility else None,
+        'max_drawdown': rounded(drawdown[trough]),
+        'drawdown_peak': dates[peak],
+        'drawdown_trough': dates[trough],
+    }
+    if include_series:
+        result['series'] = {
+            'dates': [d.isoformat() for d in dates],
+            'daily_return': [None] + [rounded(r) for r in returns],
+            'cumulative_return': [rounded(r) for r in cumulative],
+            'rolling_volatility': [None] + [rounded(v) for v in rolling],
+            'drawdown': [rounded(d) for d in drawdown],
+        }
+    return result
+
+
+def portfolio_analytics(rows, window, include_series=False):
+    frame = pd.DataFrame.from_records(list(rows), columns=['date', 'portfolio', 'value'])
+    record_rows(len(frame))
+    results = {}
+    for name, group in frame.groupby('portfolio', sort=True):
+        group = group.loc[group['value'] > 0].sort_values('date')
+        if group.empty:
+            continue
+        results[name] = series_analytics(
+            list(group['date']),
+            group['value'].to_numpy(dtype='float64'),
+            window,
+            include_series=include_series
+        )
+    return results
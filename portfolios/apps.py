@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class PortfoliosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'portfolios'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .database import configure_connection
+        from .metrics import install_query_recorder
+        connection_created.connect(configure_connection)
+        connection_created.connect(install_query_recorder)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from functools import wraps
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction as db_transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from .metrics import timed_serialization
+
+API_CACHE_ALIAS = 'api'
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+_inflight_tasks = {}
+
+
+class InflightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def version_file():
+    return Path(settings.PORTFOLIO_DATA_VERSION_FILE)
+
+
+def price_version_file():
+    return Path(settings.PRICE_VERSION_FILE)
+
+
+def read_version(path):
+    try:
+        return path.read_text().strip()
+    except FileNotFoundError:
+        return '0'
+
+
+def write_version(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+
+def data_version():
+    return read_version(version_file())
+
+
+def write_data_version():
+    write_version(version_file())
+
+
+def bump_data_version():
+    db_transaction.on_commit(write_data_version)
+
+
+def price_version():
+    return read_version(price_version_file())
+
+
+def write_price_version():
+    write_version(price_version_file())
+
+
+def cache_key(request, version):
+    raw = f"{request.build_absolute_uri()}|{request.META.get('HTTP_ACCEPT', '')}|{version}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def coalesce(key, compute):
+    # peticiones idénticas en curso esperan el resultado de la primera en lugar de repetir la consulta
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = InflightCall()
+    if not leader:
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+    try:
+        call.result = compute()
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
+
+
+async def acoalesce(key, compute):
+    # una tarea solo se puede esperar desde su propio loop; con async_to_sync cada hilo tiene el suyo
+    loop_key = (asyncio.get_running_loop(), key)
+    with _inflight_lock:
+        task = _inflight_tasks.get(loop_key)
+        if task is None:
+            task = _inflight_tasks[loop_key] = asyncio.ensure_future(compute())
+            task.add_done_callback(lambda _: _inflight_tasks.pop(loop_key, None))
+    # shield: si un cliente se desconecta no se cancela la consulta compartida
+    return await asyncio.shield(task)
+
+
+def rendered(response):
+    if hasattr(response, 'render'):
+        with timed_serialization():
+            response.render()
+    return response.status_code, response.content, response['Content-Type']
+
+
+def etag_response(request, key):
+    etag = f'"{key}"'
+    if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return None
+
+
+def cached_response(status, content, content_type, key):
+    response = HttpResponse(content, content_type=content_type, status=status)
+    if status == 200:
+        response['ETag'] = f'"{key}"'
+    return response
+
+
+def cached_api(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        key = cache_key(request, data_version())
+        not_modified = etag_response(request, key)
+        if not_modified is not None:
+            return not_modified
+        cache = caches[API_CACHE_ALIAS]
+        cached = cache.get(key)
+        if cached is None:
+            def compute():
+                status, content, content_type = rendered(view(request, *args, **kwargs))
+                if status == 200:
+                    cache.set(key, (content, content_type))
+                return status, content, content_type
+            return cached_response(*coalesce(key, compute), key)
+        return cached_response(200, *cached, key)
+    return wrapper
+
+
+def acached_api(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        key = cache_key(request, data_version())
+        not_modified = etag_response(request, key)
+        if not_modified is not None:
+            return not_modified
+        cache = caches[API_CACHE_ALIAS]
+        cached = await cache.aget(key)
+        if cached is None:
+            async def compute():
+                status, content, content_type = rendered(await view(request, *args, **kwargs))
+                if status == 200:
+                    await cache.aset(key, (content, content_type))
+                return status, content, content_type
+            return cached_response(*await acoalesce(key, compute), key)
+        return cached_response(200, *cached, key)
+    return wrapper
@@ -0,0 +1,50 @@
+import pandas as pd
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from .metrics import record_rows
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    format = 'columnar'
+
+
+COLUMNAR_RENDERERS = list(api_settings.DEFAULT_RENDERER_CLASSES) + [ColumnarJSONRenderer]
+
+
+def is_columnar(request):
+    return request.accepted_renderer.format == ColumnarJSONRenderer.format
+
+
+def dense(frame):
+    return frame.astype(object).where(frame.notna(), None).to_numpy().tolist()
+
+
+def axis(index):
+    return [d.isoformat() for d in index]
+
+
+def columnar_values(rows):
+    frame = pd.DataFrame.from_records(list(rows), columns=['date', 'portfolio', 'value'])
+    record_rows(len(frame))
+    if frame.empty:
+        return {'dates': [], 'portfolios': {}}
+    table = frame.pivot(index='date', columns='portfolio', values='value').sort_index()
+    return {
+        'dates': axis(table.index),
+        'portfolios': {name: dense(table[[name]].T)[0] for name in table.columns}
+    }
+
+
+def columnar_weights(rows):
+    frame = pd.DataFrame.from_records(list(rows), columns=['date', 'portfolio', 'asset', 'weight', 'amount'])
+    record_rows(len(frame))
+    if frame.empty:
+        return {'dates': [], 'assets': [], 'portfolios': {}}
+    dates = pd.Index(sorted(frame['date'].unique()))
+    assets = sorted(frame['asset'].unique())
+    portfolios = {}
+    for name, group in frame.groupby('portfolio', sort=True):
+        weights = group.pivot(index='asset', columns='date', values='weight').reindex(index=assets, columns=dates)
+        amounts = group.pivot(index='asset', columns='date', values='amount').reindex(index=assets, columns=dates)
+        portfolios[name] = {'weight': dense(weights), 'amount': dense(amounts)}
+    return {'dates': axis(dates), 'assets': assets, 'portfolios': portfolios}
@@ -0,0 +1,82 @@
+import io
+from django.conf import settings
+from django.db import connections, router, transaction as db_transaction
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+
+
+def copy_text(value):
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def copy_rows(cursor, sql, rows):
+    if hasattr(cursor, 'copy'):
+        # psycopg 3
+        with cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+        return
+    # psycopg2
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_text(value) for value in row) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(sql, buffer)
+
+
+def copy_upsert(model, objs, unique_fields, update_fields=None, ignore_conflicts=False):
+    connection = connections[router.db_for_write(model)]
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    staging = quote(f"{model._meta.db_table}_copy")
+    columns = ', '.join(quote(f.column) for f in fields)
+    conflict = ', '.join(quote(model._meta.get_field(name).column) for name in unique_fields)
+    if ignore_conflicts or not update_fields:
+        action = 'DO NOTHING'
+    else:
+        action = 'DO UPDATE SET ' + ', '.join(
+            f"{quote(model._meta.get_field(name).column)} = EXCLUDED.{quote(model._meta.get_field(name).column)}"
+            for name in update_fields
+        )
+    rows = ([f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields] for obj in objs)
+    with db_transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns} FROM {table} WITH NO DATA")
+        copy_rows(cursor.cursor, f"COPY {staging} ({columns}) FROM STDIN", rows)
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON CONFLICT ({conflict}) {action}")
+
+
+def bulk_write(model, objs, batch_size, unique_fields, update_fields=None, ignore_conflicts=False):
+    # en PostgreSQL los lotes grandes van por COPY a una tabla temporal y un único INSERT ... ON CONFLICT
+    connection = connections[router.db_for_write(model)]
+    if connection.vendor == 'postgresql' and len(objs) >= settings.POSTGRES_COPY_MIN_ROWS:
+        return copy_upsert(model, objs, unique_fields, update_fields, ignore_conflicts)
+    if ignore_conflicts:
+        return model.objects.bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+    return model.objects.bulk_create(
+        objs,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields
+    )
+
+
+def lock_table(model):
+    # serializa las transacciones que leen y luego escriben la tabla (p. ej. al reclamar jobs)
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [model._meta.db_table])
+        else:
+            # en SQLite cualquier escritura toma el lock de la base antes de leer
+            cursor.execute(f"UPDATE {connection.ops.quote_name(model._meta.db_table)} SET id = id WHERE 0")
@@ -1,240 +1,363 @@
 import pandas as pd
-from decimal import Decimal
-from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from datetime import date, datetime
 from django.db import transaction as db_transaction
-from tqdm import tqdm
-from .models import Asset, Portfolio, AssetPrice, PortfolioWeight, PortfolioHolding, Transaction
+from .models import (
+    Asset, Portfolio, AssetPrice, PortfolioWeight, Transaction, SheetFingerprint, PriceRowFingerprint
+)
+from .holdings import HoldingsEngine, BULK_BATCH_SIZE, PRICE_STEP, WEIGHT_STEP, invalidate_initial_book
+from .readers import DEFAULT_CHUNK_SIZE, EXCEL_SUFFIXES, file_suffix, iter_price_batches, read_weights
+from .database import bulk_write
+from .fingerprints import price_row_digests, sheet_digest
+from .metrics import etl_stage, record_rows
+from .prices import prices_changed
+from .progress import ConsoleHook
+from .valuation import ValuationIndex
+
+WEIGHT_COLUMNS = {'C': 'Portfolio 1', 'D': 'Portfolio 2'}
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and pd.notna(value)
+
+
+def weight_columns(weights_df):
+    header = weights_df.loc[weights_df['B'] == 'Asset']
+    if header.empty:
+        return WEIGHT_COLUMNS
+    names = header.iloc[0]
+    columns = {
+        column: names[column].strip()
+        for column in weights_df.columns[2:]
+        if isinstance(names[column], str) and names[column].strip()
+    }
+    return columns or WEIGHT_COLUMNS
 
 
 class PortfolioETL:
-    def __init__(self, excel_file_path):
+    def __init__(self, excel_file_path=None, weights_file_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, hooks=None):
         self.excel_file_path = excel_file_path
+        self.weights_file_path = weights_file_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.hooks = list(hooks) if hooks is not None else [ConsoleHook()]
 
-    def load_data(self):
-        print('Leyendo planilla...')
-        weights_df = pd.read_excel(self.excel_file_path, sheet_name='Weights')
-        prices_df = pd.read_excel(self.excel_file_path, sheet_name='Precios')
-        print('Cargando activos y pesos...')
-        self.load_assets_and_weights(weights_df)
-        print('Cargando precios...')
-        self.load_prices(prices_df)
-        print('Calculando holdings...')
+    def log(self, text):
+        for hook in self.hooks:
+            hook.message(text)
+
+    def load_data(self, incremental=False):
+        if incremental:
+            return self.load_incremental()
+        self.log('Leyendo planilla...')
+        weights_path = self.weights_path()
+        with db_transaction.atomic():
+            if weights_path:
+                self.log('Cargando activos y pesos...')
+                self.load_assets_and_weights(read_weights(weights_path))
+                self.record_fingerprint('Weights', sheet_digest(weights_path, 'Weights'))
+            else:
+                self.log('Sin archivo de pesos, se usan los activos existentes')
+            self.log('Cargando precios...')
+            self.load_price_batches(iter_price_batches(self.excel_file_path, self.chunk_size), fingerprints=True)
+            # la próxima carga incremental parte de lo que se cargó aquí
+            self.record_fingerprint('Precios', sheet_digest(self.excel_file_path, 'Precios'))
+        self.log('Calculando holdings...')
         self.calculate_holdings()
-        print('Holdings calculados')
+        self.log('Holdings calculados')
 
+    def weights_path(self):
+        if self.weights_file_path is None and file_suffix(self.excel_file_path) in EXCEL_SUFFIXES:
+            return self.excel_file_path
+        return self.weights_file_path
+
+    def load_incremental(self):
+        self.log('Leyendo planilla (modo incremental)...')
+        weights_path = self.weights_path()
+        weights_changed = False
+        with db_transaction.atomic():
+            if weights_path:
+                digest = sheet_digest(weights_path, 'Weights')
+                if self.fingerprint_changed('Weights', digest):
+                    self.log('Cargando activos y pesos...')
+                    report = self.load_assets_and_weights(read_weights(weights_path))
+                    # la huella de la hoja puede cambiar sin que cambie ningún peso (p. ej. al volver a guardar el libro)
+                    weights_changed = bool(report['inserted'] or report['updated'])
+                else:
+                    self.log('Pesos sin cambios')
+            digest = sheet_digest(self.excel_file_path, 'Precios')
+            changed_dates = []
+            if self.fingerprint_changed('Precios', digest):
+                self.log('Cargando precios nuevos o modificados...')
+                changed_dates = self.load_changed_prices(iter_price_batches(self.excel_file_path, self.chunk_size))
+            else:
+                self.log('Precios sin cambios')
+        if weights_changed:
+            self.log('Recalculando holdings completos...')
+            self.calculate_holdings(with_transactions=True)
+        elif changed_dates:
+            self.log(f"Recalculando holdings desde {min(changed_dates)}...")
+            self.recalculate_from(min(changed_dates))
+        self.log('Holdings actualizados')
+        return changed_dates
+
+    def fingerprint_changed(self, sheet, digest):
+        fingerprint, created = SheetFingerprint.objects.get_or_create(sheet=sheet, defaults={'digest': digest})
+        if created:
+            return True
+        if fingerprint.digest == digest:
+            return False
+        fingerprint.digest = digest
+        fingerprint.save()
+        return True
+
+    def record_fingerprint(self, sheet, digest):
+        SheetFingerprint.objects.update_or_create(sheet=sheet, defaults={'digest': digest})
+
+    def record_row_fingerprints(self, digests):
+        PriceRowFingerprint.objects.bulk_create(
+            [PriceRowFingerprint(date=d, digest=digest) for d, digest in digests.items()],
+            batch_size=BULK_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['date'],
+            update_fields=['digest']
+        )
+
+    @etl_stage('load_prices')
+    def load_changed_prices(self, batches):
+        asset_ids = dict(Asset.objects.values_list('symbol', 'id'))
+        report = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        changed_dates = []
+        for prices_df in batches:
+            prices_df.columns = prices_df.columns.astype(str)
+            digests = price_row_digests(prices_df)
+            stored = dict(PriceRowFingerprint.objects.filter(date__in=list(digests.index)).values_list('date', 'digest'))
+            changed = digests[[stored.get(d) != digest for d, digest in digests.items()]]
+            if changed.empty:
+                continue
+            dates = pd.to_datetime(prices_df[prices_df.columns[0]], errors='coerce').dt.date
+            for key, value in self.upsert_prices(prices_df.loc[dates.isin(changed.index)], asset_ids).items():
+                report[key] += value
+            self.record_row_fingerprints(changed)
+            changed_dates.extend(changed.index)
+        if changed_dates:
+            prices_changed()
+        self.log(f"Fechas nuevas o modificadas: {len(changed_dates)}")
+        self.log(f"Precios insertados: {report['inserted']} actualizados: {report['updated']} omitidos: {report['skipped']}")
+        return changed_dates
+
+    @etl_stage('recalculation')
+    def recalculate_from(self, start_date):
+        engine = HoldingsEngine()
+        for portfolio in Portfolio.objects.all():
+            if engine.needs_rebuild(portfolio, start_date):
+                self.log(f"Recalculando {portfolio.name} completo")
+                updated = engine.rebuild(portfolio, with_transactions=True)
+            else:
+                updated = engine.recompute_from(portfolio, start_date)
+            self.log(f"{portfolio.name}: {updated} holdings")
+
+    @etl_stage('load_assets_and_weights')
     def load_assets_and_weights(self, weights_df):
-        Portfolio.objects.get_or_create(name='Portfolio 1')
-        Portfolio.objects.get_or_create(name='Portfolio 2')
-        created_weights = 0
-        for index, row in weights_df.iterrows():
-            symbol = row.get('B')
-            w1 = row.get('C')
-            w2 = row.get('D')
-            if isinstance(symbol, str) and symbol and symbol != 'Asset':
-                asset, _ = Asset.objects.get_or_create(symbol=symbol, defaults={'name': symbol})
-                if pd.notna(w1) and isinstance(w1, (int, float)):
-                    _, created = PortfolioWeight.objects.get_or_create(
-                        portfolio=Portfolio.objects.get(name='Portfolio 1'),
-                        asset=asset,
-                        defaults={'weight': Decimal(str(w1))}
-                    )
-                    if created:
-                        created_weights += 1
-                if pd.notna(w2) and isinstance(w2, (int, float)):
-                    _, created = PortfolioWeight.objects.get_or_create(
-                        portfolio=Portfolio.objects.get(name='Portfolio 2'),
-                        asset=asset,
-                        defaults={'weight': Decimal(str(w2))}
-                    )
-                    if created:
-                        created_weights += 1
-        print(f"Activos: {Asset.objects.count()} Pesos creados: {created_weights}")
+        columns = weight_columns(weights_df)
+        portfolios = {
+            column: Portfolio.objects.get_or_create(name=name)[0]
+            for column, name in columns.items()
+        }
+        symbols = weights_df['B'].where(weights_df['B'].map(lambda v: isinstance(v, str) and v not in ('', 'Asset')))
+        weights_df = weights_df.loc[symbols.notna()]
+        asset_ids = self.resolve_assets(weights_df['B'].unique())
+        long_df = weights_df.melt(id_vars='B', value_vars=list(columns), var_name='column', value_name='weight')
+        long_df = long_df.loc[long_df['weight'].map(is_number)]
+        existing = {
+            (portfolio_id, asset_id): weight
+            for portfolio_id, asset_id, weight in PortfolioWeight.objects.filter(
+                portfolio__in=portfolios.values()
+            ).values_list('portfolio_id', 'asset_id', 'weight')
+        }
+        to_write = []
+        report = {'inserted': 0, 'updated': 0, 'skipped': len(weights_df) * len(columns) - len(long_df)}
+        for symbol, column, value in long_df.itertuples(index=False):
+            portfolio = portfolios[column]
+            weight = Decimal(str(value)).quantize(WEIGHT_STEP)
+            current = existing.get((portfolio.id, asset_ids[symbol]))
+            if current == weight:
+                report['skipped'] += 1
+                continue
+            report['inserted' if current is None else 'updated'] += 1
+            to_write.append(PortfolioWeight(portfolio=portfolio, asset_id=asset_ids[symbol], weight=weight))
+        record_rows(len(to_write))
+        with db_transaction.atomic():
+            PortfolioWeight.objects.bulk_create(
+                to_write,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['portfolio', 'asset'],
+                update_fields=['weight']
+            )
+        self.log(f"Activos: {len(asset_ids)} Pesos insertados: {report['inserted']} actualizados: {report['updated']} omitidos: {report['skipped']}")
+        return report
+
+    def resolve_assets(self, symbols):
+        asset_ids = dict(Asset.objects.filter(symbol__in=symbols).values_list('symbol', 'id'))
+        missing = [symbol for symbol in symbols if symbol not in asset_ids]
+        if missing:
+            Asset.objects.bulk_create([Asset(symbol=symbol, name=symbol) for symbol in missing], batch_size=BULK_BATCH_SIZE, ignore_conflicts=True)
+            asset_ids.update(Asset.objects.filter(symbol__in=missing).values_list('symbol', 'id'))
+        return asset_ids
 
     def load_prices(self, prices_df):
+        return self.load_price_batches([prices_df])
+
+    @etl_stage('load_prices')
+    def load_price_batches(self, batches, fingerprints=False):
+        asset_ids = dict(Asset.objects.values_list('symbol', 'id'))
+        report = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        with db_transaction.atomic():
+            for prices_df in batches:
+                for key, value in self.upsert_prices(prices_df, asset_ids).items():
+                    report[key] += value
+                if fingerprints:
+                    self.record_row_fingerprints(price_row_digests(prices_df))
+            prices_changed()
+        self.log(f"Precios insertados: {report['inserted']} actualizados: {report['updated']} omitidos: {report['skipped']}")
+        return report
+
+    def upsert_prices(self, prices_df, asset_ids):
         prices_df.columns = prices_df.columns.astype(str)
         date_column = prices_df.columns[0]
-        inserted = 0
-        for index, row in prices_df.iterrows():
-            if pd.notna(row[date_column]):
-                date = pd.to_datetime(row[date_column]).date()
-                for col in prices_df.columns[1:]:
-                    val = row[col]
-                    if pd.notna(val) and isinstance(val, (int, float)):
-                        try:
-                            asset = Asset.objects.get(symbol=col)
-                            _, created = AssetPrice.objects.get_or_create(
-                                asset=asset,
-                                date=date,
-                                defaults={'price': Decimal(str(val))}
-                            )
-                            if created:
-                                inserted += 1
-                        except Asset.DoesNotExist:
-                            continue
-        print(f"Precios insertados: {inserted}")
-
-    def calculate_holdings(self):
-        dates = list(AssetPrice.objects.values_list('date', flat=True).distinct().order_by('date'))
-        portfolios = Portfolio.objects.all()
-        for portfolio in portfolios:
-            print(f"Calculando {portfolio.name}")
-            PortfolioHolding.objects.filter(portfolio=portfolio).delete()
-            weights = list(PortfolioWeight.objects.filter(portfolio=portfolio).select_related('asset'))
-            initial_quantities = {}
-            for w in weights:
-                initial_price = AssetPrice.objects.filter(asset=w.asset).order_by('date').first()
-                if not initial_price:
-                    continue
-                qty = ((w.weight * portfolio.initial_value) / initial_price.price).quantize(Decimal('0.000001'))
-                initial_quantities[w.asset_id] = qty
-            asset_ids = list(initial_quantities.keys())
-            holdings_to_create = []
-            for d in dates:
-                prices = AssetPrice.objects.filter(date=d, asset_id__in=asset_ids)
-                price_map = {p.asset_id: p.price for p in prices}
-                total_value = Decimal('0')
-                amounts = {}
-                for aid, qty in initial_quantities.items():
-                    price = price_map.get(aid)
-                    if price is None:
-                        continue
-                    amt = (Decimal(str(qty)) * Decimal(str(price))).quantize(Decimal('0.01'))
-                    amounts[aid] = amt
-                    total_value += amt
-                if total_value == 0:
-                    continue
-                for aid, qty in initial_quantities.items():
-                    price = price_map.get(aid)
-                    if price is None:
-                        continue
-                    amt = amounts[aid]
-                    wgt = (amt / total_value).quantize(Decimal('0.000001'))
-                    holdings_to_create.append(PortfolioHolding(
-                        portfolio=portfolio,
-                        asset_id=aid,
-                        date=d,
-                        quantity=qty,
-                        amount=amt,
-                        weight=wgt
-                    ))
-            if holdings_to_create:
-                PortfolioHolding.objects.bulk_create(holdings_to_create, ignore_conflicts=True)
+        long_df = prices_df.melt(id_vars=date_column, var_name='symbol', value_name='price')
+        long_df['date'] = pd.to_datetime(long_df[date_column], errors='coerce').dt.date
+        long_df['asset_id'] = long_df['symbol'].map(asset_ids)
+        long_df['price'] = pd.to_numeric(long_df['price'], errors='coerce')
+        valid_df = long_df.loc[long_df['date'].notna() & long_df['asset_id'].notna() & long_df['price'].notna()]
+        report = {'inserted': 0, 'updated': 0, 'skipped': len(long_df) - len(valid_df)}
+        if valid_df.empty:
+            return report
+        existing = {
+            (asset_id, price_date): price
+            for asset_id, price_date, price in AssetPrice.objects.filter(
+                asset_id__in=valid_df['asset_id'].unique().astype(int).tolist(),
+                date__range=(valid_df['date'].min(), valid_df['date'].max())
+            ).values_list('asset_id', 'date', 'price')
+        }
+        to_write = []
+        for asset_id, price_date, value in valid_df[['asset_id', 'date', 'price']].itertuples(index=False):
+            price = Decimal(repr(value)).quantize(PRICE_STEP)
+            current = existing.get((int(asset_id), price_date))
+            if current == price:
+                report['skipped'] += 1
+                continue
+            report['inserted' if current is None else 'updated'] += 1
+            to_write.append(AssetPrice(asset_id=int(asset_id), date=price_date, price=price))
+        record_rows(len(to_write))
+        bulk_write(AssetPrice, to_write, BULK_BATCH_SIZE, unique_fields=['asset', 'date'], update_fields=['price'])
+        if to_write:
+            invalidate_initial_book({p.asset_id for p in to_write}, min(p.date for p in to_write))
+        return report
+
+    @etl_stage('calculate_holdings')
+    def calculate_holdings(self, with_transactions=False):
+        engine = HoldingsEngine()
+        portfolios = list(Portfolio.objects.all())
+        if self.workers > 1:
+            self.log(f"Calculando {len(portfolios)} portafolios con {self.workers} procesos")
+        for portfolio, created in engine.rebuild_all(portfolios, with_transactions, self.workers):
+            self.log(f"Calculando {portfolio.name}")
+            self.log(f"Holdings creados: {created}")
 
     def process_transaction(self, portfolio_name, sell_asset, sell_amount, buy_asset, buy_amount, transaction_date):
-        print('Iniciando transacción...')
-        portfolio = Portfolio.objects.get(name=portfolio_name)
-        sell_asset_obj = Asset.objects.get(symbol=sell_asset)
-        buy_asset_obj = Asset.objects.get(symbol=buy_asset)
-        sell_price = AssetPrice.objects.get(asset=sell_asset_obj, date=transaction_date)
-        buy_price = AssetPrice.objects.get(asset=buy_asset_obj, date=transaction_date)
-        sell_quantity = (sell_amount / sell_price.price).quantize(Decimal('0.000001'))
-        buy_quantity = (buy_amount / buy_price.price).quantize(Decimal('0.000001'))
-        print(f"Vender {sell_asset}: {sell_amount} -> qty {sell_quantity}")
-        print(f"Comprar {buy_asset}: {buy_amount} -> qty {buy_quantity}")
-        Transaction.objects.create(portfolio=portfolio, asset=sell_asset_obj, date=transaction_date, transaction_type='SELL', amount=sell_amount, quantity=sell_quantity)
-        Transaction.objects.create(portfolio=portfolio, asset=buy_asset_obj, date=transaction_date, transaction_type='BUY', amount=buy_amount, quantity=buy_quantity)
-        print('Recalculando holdings posteriores a la transacción...')
-        self.recalculate_holdings_after_transaction(portfolio, transaction_date)
-        print('Re cálculo de holdings terminado')
+        self.log('Iniciando transacción...')
+        sell, buy = self.process_transactions([
+            {'portfolio': portfolio_name, 'asset': sell_asset, 'transaction_type': 'SELL', 'amount': sell_amount, 'date': transaction_date},
+            {'portfolio': portfolio_name, 'asset': buy_asset, 'transaction_type': 'BUY', 'amount': buy_amount, 'date': transaction_date},
+        ])
+        self.log(f"Vender {sell_asset}: {sell.amount} -> qty {sell.quantity}")
+        self.log(f"Comprar {buy_asset}: {buy.amount} -> qty {buy.quantity}")
 
-    def recalculate_holdings_after_transaction(self, portfolio, transaction_date):
-        weights = list(PortfolioWeight.objects.filter(portfolio=portfolio).select_related('asset'))
-        initial_quantities = {}
-        for w in weights:
-            initial_price = AssetPrice.objects.filter(asset=w.asset).order_by('date').first()
-            if not initial_price:
+    @etl_stage('process_transactions')
+    def process_transactions(self, trades):
+        trades = [self.normalize_trade(trade) for trade in trades]
+        if not trades:
+            return []
+        portfolios = {p.name: p for p in Portfolio.objects.filter(name__in={t['portfolio'] for t in trades})}
+        assets = {a.symbol: a for a in Asset.objects.filter(symbol__in={t['asset'] for t in trades})}
+        engine = HoldingsEngine()
+        errors = []
+        transactions = []
+        for i, trade in enumerate(trades, start=1):
+            portfolio = portfolios.get(trade['portfolio'])
+            asset = assets.get(trade['asset'])
+            if portfolio is None:
+                errors.append(f"Fila {i}: portafolio desconocido {trade['portfolio']}")
                 continue
-            qty = ((w.weight * portfolio.initial_value) / initial_price.price).quantize(Decimal('0.000001'))
-            initial_quantities[w.asset_id] = qty
-        txs = Transaction.objects.filter(portfolio=portfolio, date__lte=transaction_date)
-        for t in txs:
-            current_qty = initial_quantities.get(t.asset_id, Decimal('0'))
-            if t.transaction_type == 'BUY':
-                new_qty = (current_qty + t.quantity).quantize(Decimal('0.000001'))
-                initial_quantities[t.asset_id] = new_qty
-            else:
-                new_qty = (current_qty - t.quantity).quantize(Decimal('0.000001'))
-                if new_qty < 0:
-                    new_qty = Decimal('0')
-                initial_quantities[t.asset_id] = new_qty
-        asset_ids = list(initial_quantities.keys())
-        future_dates = list(AssetPrice.objects.filter(asset_id__in=asset_ids, date__gte=transaction_date).values_list('date', flat=True).distinct().order_by('date'))
-        print(f"Fechas a recalcular: {len(future_dates)} Activos: {len(asset_ids)}")
-
-        negative_qty_count = 0
-        decimal_error_count = 0
-
-        for d in tqdm(future_dates, desc='Fechas', unit='d'):
-            prices = AssetPrice.objects.filter(date=d, asset_id__in=asset_ids)
-            price_map = {p.asset_id: p.price for p in prices}
-            total_value = Decimal('0')
-            amounts = {}
-            for aid, qty in initial_quantities.items():
-                price = price_map.get(aid)
-                if price is None:
-                    continue
-                amt = (Decimal(str(qty)) * Decimal(str(price))).quantize(Decimal('0.01'))
-                amounts[aid] = amt
-                total_value += amt
-            if total_value == 0:
+            if asset is None:
+                errors.append(f"Fila {i}: activo desconocido {trade['asset']}")
+                continue
+            price = engine.prices.as_of(asset.id, trade['date'])
+            if price is None:
+                errors.append(f"Fila {i}: sin precio vigente para {asset.symbol} en {trade['date']}")
                 continue
-            for aid, qty in initial_quantities.items():
-                price = price_map.get(aid)
-                if price is None:
-                    continue
-
-                if qty < 0:
-                    negative_qty_count += 1
-                    continue
-
-                amt = amounts[aid]
-                wgt = (amt / total_value).quantize(Decimal('0.000001'))
-
-                try:
-                    holding, created = PortfolioHolding.objects.get_or_create(
-                        portfolio=portfolio,
-                        asset_id=aid,
-                        date=d,
-                        defaults={
-                            'quantity': Decimal(str(qty)).quantize(Decimal('0.000001')),
-                            'amount': Decimal(str(amt)).quantize(Decimal('0.01')),
-                            'weight': Decimal(str(wgt)).quantize(Decimal('0.000001'))
-                        }
-                    )
-                    if not created:
-                        holding.quantity = Decimal(str(qty)).quantize(Decimal('0.000001'))
-                        holding.amount = Decimal(str(amt)).quantize(Decimal('0.01'))
-                        holding.weight = Decimal(str(wgt)).quantize(Decimal('0.000001'))
-                        holding.save()
-                except Exception as e:
-                    decimal_error_count += 1
-                    continue
-
-        if negative_qty_count > 0 or decimal_error_count > 0:
-            print(f"\nResumen de errores manejados:")
-            if negative_qty_count > 0:
-                print(f"  - Cantidades negativas omitidas: {negative_qty_count}")
-            if decimal_error_count > 0:
-                print(f"  - Errores de precisión decimal: {decimal_error_count}")
+            transactions.append(Transaction(
+                portfolio=portfolio,
+                asset=asset,
+                date=trade['date'],
+                transaction_type=trade['transaction_type'],
+                amount=trade['amount'],
+                quantity=(trade['amount'] / price).quantize(Decimal('0.000001'))
+            ))
+        if errors:
+            raise ValueError('; '.join(errors))
+        by_portfolio = {}
+        for t in transactions:
+            by_portfolio.setdefault(t.portfolio, []).append(t)
+        # las transacciones y el recálculo se confirman juntos; si algo falla no quedan trades sin holdings
+        with db_transaction.atomic():
+            Transaction.objects.bulk_create(transactions)
+            self.log('Recalculando holdings posteriores a las transacciones...')
+            for portfolio, portfolio_transactions in by_portfolio.items():
+                updated = engine.apply_transactions(portfolio, portfolio_transactions)
+                self.log(f"{portfolio.name}: {len(portfolio_transactions)} transacciones, {updated} holdings recalculados")
+        return transactions
+
+    def normalize_trade(self, trade):
+        if not isinstance(trade, dict):
+            raise ValueError(f"Transacción inválida: {trade!r}")
+        transaction_type = str(trade.get('transaction_type', '')).strip().upper()
+        if transaction_type not in ('BUY', 'SELL'):
+            raise ValueError(f"Tipo de transacción inválido: {trade.get('transaction_type')}")
+        trade_date = trade.get('date')
+        if isinstance(trade_date, str):
+            try:
+                trade_date = datetime.strptime(trade_date.strip(), '%Y-%m-%d').date()
+            except ValueError:
+                raise ValueError(f"Fecha inválida: {trade_date}")
+        elif isinstance(trade_date, datetime):
+            trade_date = trade_date.date()
+        if not isinstance(trade_date, date):
+            raise ValueError(f"Fecha inválida: {trade_date}")
+        try:
+            amount = Decimal(str(trade.get('amount')))
+            # NaN e infinito no se pueden comparar ni redondear
+            if not amount.is_finite():
+                raise InvalidOperation
+            amount = amount.quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f"Monto inválido: {trade.get('amount')}")
+        if amount <= 0:
+            raise ValueError(f"Monto inválido: {trade.get('amount')}")
+        return {
+            'portfolio': str(trade.get('portfolio', '')).strip(),
+            'asset': str(trade.get('asset', '')).strip(),
+            'transaction_type': transaction_type,
+            'amount': amount,
+            'date': trade_date,
+        }
+
+    @etl_stage('recalculation')
+    def recalculate_holdings_after_transaction(self, portfolio, transaction_date):
+        updated = HoldingsEngine().recalculate(portfolio, transaction_date)
+        self.log(f"Holdings recalculados desde {transaction_date}: {updated} filas")
 
     def calculate_portfolio_value_with_transactions(self, portfolio, date):
-        total_value = Decimal('0')
-        transactions = Transaction.objects.filter(portfolio=portfolio, date__lte=date)
-        for asset in Asset.objects.all():
-            initial_weight = PortfolioWeight.objects.filter(portfolio=portfolio, asset=asset).first()
-            if not initial_weight:
-                continue
-            initial_price = AssetPrice.objects.filter(asset=asset).order_by('date').first()
-            current_price = AssetPrice.objects.filter(asset=asset, date=date).first()
-            if not initial_price or not current_price:
-                continue
-            initial_quantity = (initial_weight.weight * portfolio.initial_value) / initial_price.price
-            asset_transactions = transactions.filter(asset=asset)
-            for transaction in asset_transactions:
-                if transaction.transaction_type == 'BUY':
-                    initial_quantity += transaction.quantity
-                else:
-                    initial_quantity -= transaction.quantity
-            amount = initial_quantity * current_price.price
-            total_value += amount
-        return total_value
+        return ValuationIndex.build(portfolio).value(date)
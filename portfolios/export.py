@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+from datetime import datetime
+from .models import PortfolioHolding, PortfolioValue
+
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORTS = {
+    'holdings': {
+        'model': PortfolioHolding,
+        'ordering': ['date', 'portfolio_id', 'asset_id'],
+        'columns': [
+            ('date', 'date', None),
+            ('portfolio_name', 'portfolio__name', None),
+            ('asset_name', 'asset__symbol', None),
+            ('quantity', 'quantity', (15, 6)),
+            ('amount', 'amount', (15, 2)),
+            ('weight', 'weight', (8, 6)),
+        ],
+    },
+    'values': {
+        'model': PortfolioValue,
+        'ordering': ['date', 'portfolio_id'],
+        'columns': [
+            ('date', 'date', None),
+            ('portfolio_name', 'portfolio__name', None),
+            ('total_value', 'total_value', (17, 2)),
+        ],
+    },
+}
+
+
+def parse_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Fecha inválida: {value}")
+
+
+def check_export(kind, export_format):
+    if kind not in EXPORTS:
+        raise ValueError(f"Exportación desconocida: {kind}")
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación no soportado: {export_format}")
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError('Para exportar a Parquet instale pyarrow: python -m pip install pyarrow')
+
+
+def export_rows(kind, fecha_inicio=None, fecha_fin=None, portfolio=None, asset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    spec = EXPORTS[kind]
+    rows = spec['model'].objects.order_by(*spec['ordering'])
+    if fecha_inicio:
+        rows = rows.filter(date__gte=fecha_inicio)
+    if fecha_fin:
+        rows = rows.filter(date__lte=fecha_fin)
+    if portfolio:
+        rows = rows.filter(portfolio__name=portfolio)
+    if asset:
+        if kind != 'holdings':
+            raise ValueError('El filtro por activo solo aplica a holdings')
+        rows = rows.filter(asset__symbol=asset)
+    # iterator() usa cursores del lado del servidor donde la base los soporta
+    return rows.values_list(*[field for _, field, _ in spec['columns']]).iterator(chunk_size=chunk_size)
+
+
+def chunked(rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def cell(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def iter_ndjson(kind, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    names = [name for name, _, _ in EXPORTS[kind]['columns']]
+    for chunk in chunked(rows, chunk_size):
+        yield ''.join(json.dumps(dict(zip(names, map(cell, row)))) + '\n' for row in chunk).encode()
+
+
+def iter_csv(kind, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in EXPORTS[kind]['columns']])
+    for chunk in chunked(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class ChunkSink(io.RawIOBase):
+    # destino de escritura para pyarrow que entrega los bytes a medida que se escriben
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_schema(kind):
+    import pyarrow as pa
+    types = {'date': pa.date32()}
+    return pa.schema([
+        (name, pa.decimal128(*decimal) if decimal else types.get(name, pa.string()))
+        for name, _, decimal in EXPORTS[kind]['columns']
+    ])
+
+
+def iter_parquet(kind, rows, chunk_size=EXPORT_CHUNK_SIZE):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = parquet_schema(kind)
+    sink = ChunkSink()
+    # un row group por bloque, así la memoria no depende del total de filas
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in chunked(rows, chunk_size):
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(zip(*chunk), schema)], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+EXPORT_WRITERS = {'ndjson': iter_ndjson, 'csv': iter_csv, 'parquet': iter_parquet}
+
+
+def stream_export(kind, export_format, chunk_size=EXPORT_CHUNK_SIZE, **filters):
+    check_export(kind, export_format)
+    rows = export_rows(kind, chunk_size=chunk_size, **filters)
+    return EXPORT_WRITERS[export_format](kind, rows, chunk_size)
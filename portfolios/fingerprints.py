@@ -0,0 +1,82 @@
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+import pandas as pd
+from .readers import EXCEL_SUFFIXES, file_suffix
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+SHARED_STRINGS = 'xl/sharedStrings.xml'
+
+
+def shared_string_indices(archive, entry):
+    indices = set()
+    for _, element in ET.iterparse(archive.open(entry)):
+        if element.tag == f'{{{MAIN_NS}}}c':
+            value = element.find(f'{{{MAIN_NS}}}v')
+            if element.get('t') == 's' and value is not None:
+                indices.add(int(value.text))
+            element.clear()
+        elif element.tag == f'{{{MAIN_NS}}}row':
+            element.clear()
+    return indices
+
+
+def shared_strings_part(archive, indices):
+    # solo los textos que usa la hoja: editar otra hoja no cambia su huella
+    digest = hashlib.sha256()
+    position = 0
+    for _, element in ET.iterparse(archive.open(SHARED_STRINGS)):
+        if element.tag == f'{{{MAIN_NS}}}si':
+            if position in indices:
+                digest.update(f"{position}:{''.join(element.itertext())}\x00".encode())
+            position += 1
+            element.clear()
+    return f"{SHARED_STRINGS}:{digest.hexdigest()}"
+
+
+def excel_sheet_digest(path, sheet_name):
+    with zipfile.ZipFile(path) as archive:
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        rel_id = next(
+            (s.get(f'{{{REL_NS}}}id') for s in workbook.iter(f'{{{MAIN_NS}}}sheet') if s.get('name') == sheet_name),
+            None
+        )
+        target = next((r.get('Target') for r in rels if r.get('Id') == rel_id), None)
+        if target is None:
+            raise ValueError(f"Hoja no encontrada: {sheet_name}")
+        entry = target.lstrip('/') if target.startswith('/') else f'xl/{target}'
+        info = archive.getinfo(entry)
+        parts = [f"{info.filename}:{info.CRC:08x}:{info.file_size}"]
+        if SHARED_STRINGS in archive.namelist():
+            indices = shared_string_indices(archive, entry)
+            if indices:
+                parts.append(shared_strings_part(archive, indices))
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for block in iter(lambda: stream.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_digest(path, sheet_name):
+    if file_suffix(path) in EXCEL_SUFFIXES:
+        return excel_sheet_digest(path, sheet_name)
+    return file_digest(path)
+
+
+def price_row_digests(prices_df):
+    date_column = prices_df.columns[0]
+    dates = pd.to_datetime(prices_df[date_column], errors='coerce').dt.date
+    values = prices_df.drop(columns=date_column)
+    values = values.reindex(columns=sorted(values.columns)).apply(pd.to_numeric, errors='coerce').round(4)
+    header = hashlib.sha1('|'.join(values.columns).encode()).hexdigest()[:24]
+    row_hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    valid = dates.notna().to_numpy()
+    digests = pd.Series([f"{header}{h:016x}" for h in row_hashes[valid]], index=dates[valid].to_numpy())
+    return digests[~digests.index.duplicated(keep='last')]
@@ -0,0 +1,61 @@
+import numpy as np
+
+QUANTITY_SCALE = 1_000_000
+PRICE_SCALE = 10_000
+AMOUNT_SCALE = 100
+WEIGHT_SCALE = 1_000_000
+INT64_MAX = int(np.iinfo('int64').max)
+
+
+def to_units(values, scale):
+    present = ~np.isnan(values)
+    return np.where(present, np.round(values * scale), 0).astype('int64'), present
+
+
+def check_range(*factors):
+    # cota por elemento en float (con margen por redondeo); el producto de los máximos de cada factor da falsos desbordes
+    bound = 1.0
+    for factor in factors:
+        bound = bound * np.abs(np.asarray(factor, dtype='float64'))
+    if np.max(bound, initial=0) >= INT64_MAX * (1 - 1e-12):
+        raise OverflowError('Valores fuera del rango de enteros de 64 bits')
+
+
+def round_remainder(quotient, remainder, denominator):
+    # mismo criterio que Decimal.quantize con el contexto por defecto (ROUND_HALF_EVEN)
+    twice = 2 * remainder
+    return quotient + ((twice > denominator) | ((twice == denominator) & (quotient % 2 == 1)))
+
+
+def round_half_even(numerator, denominator, base=0):
+    quotient, remainder = np.divmod(numerator, denominator)
+    return round_remainder(quotient + base, remainder, denominator)
+
+
+def fixed_amounts(q_units, p_units):
+    # q * p tiene escala 1e-10; se separan las unidades enteras para no desbordar int64
+    whole, fraction = np.divmod(q_units, QUANTITY_SCALE)
+    check_range(whole, p_units)
+    high, rest = np.divmod(whole * p_units, PRICE_SCALE // AMOUNT_SCALE)
+    return round_half_even(rest * QUANTITY_SCALE + fraction * p_units, QUANTITY_SCALE * PRICE_SCALE // AMOUNT_SCALE, base=high)
+
+
+def fixed_weights(cents, totals):
+    # división larga dígito a dígito: cents * 1e6 desborda int64 con posiciones sobre ~92 mil millones
+    denominator = np.where(totals == 0, 1, totals)[:, None]
+    check_range(denominator, 10)
+    quotient, remainder = np.divmod(cents, denominator)
+    for _ in range(len(str(WEIGHT_SCALE)) - 1):
+        digit, remainder = np.divmod(remainder * 10, denominator)
+        quotient = quotient * 10 + digit
+    return round_remainder(quotient, remainder, denominator)
+
+
+def compute_fixed(quantities, prices):
+    q_units, q_present = to_units(quantities, QUANTITY_SCALE)
+    p_units, p_present = to_units(prices, PRICE_SCALE)
+    present = q_present & p_present
+    cents = np.where(present, fixed_amounts(q_units, p_units), 0)
+    totals = cents.sum(axis=1)
+    weights = np.where(present & (totals != 0)[:, None], fixed_weights(cents, totals), 0)
+    return q_units, cents, present, totals, weights
@@ -0,0 +1,286 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import OuterRef, Q, Subquery
+from .cache import bump_data_version
+from .database import bulk_write
+from .fixedpoint import QUANTITY_SCALE, compute_fixed, to_units
+from .metrics import record_rows
+from .models import Asset, AssetPrice, InitialQuantity, PortfolioWeight, PortfolioHolding, PortfolioValue, Transaction
+from .parallel import build_in_pool
+from .prices import PRICE_STEP, PriceMatrix, to_decimal
+
+QUANTITY_STEP = Decimal('0.000001')
+AMOUNT_STEP = Decimal('0.01')
+WEIGHT_STEP = Decimal('0.000001')
+TIE_TOLERANCE = 1e-3
+BULK_BATCH_SIZE = 2000
+
+
+def round_amounts(quantities, prices):
+    # float64 no representa exacto qty * price, así que los casos cercanos a un empate
+    # de redondeo se recalculan con Decimal para igualar el quantize original
+    raw = quantities * prices * 100
+    cents = np.round(raw)
+    with np.errstate(invalid='ignore'):
+        ambiguous = np.abs(raw - np.floor(raw) - 0.5) < TIE_TOLERANCE
+    for i, j in zip(*np.nonzero(ambiguous)):
+        exact = to_decimal(quantities[i, j], QUANTITY_STEP) * to_decimal(prices[i, j], PRICE_STEP)
+        cents[i, j] = float(exact.quantize(AMOUNT_STEP).scaleb(2))
+    return cents
+
+
+def round_weights(cents, totals):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        raw = cents / totals[:, None] * 1e6
+        units = np.round(raw)
+        ambiguous = np.abs(raw - np.floor(raw) - 0.5) < TIE_TOLERANCE
+    for i, j in zip(*np.nonzero(ambiguous)):
+        exact = (Decimal(int(cents[i, j])) / Decimal(int(totals[i]))).quantize(WEIGHT_STEP)
+        units[i, j] = float(exact.scaleb(6))
+    return units
+
+
+def compute_float(quantities, prices):
+    cents = round_amounts(quantities, prices)
+    totals = np.nansum(cents, axis=1)
+    weights = round_weights(cents, totals)
+    present = ~np.isnan(cents)
+    valid = present & (totals != 0)[:, None]
+    return (
+        to_units(quantities, QUANTITY_SCALE)[0],
+        np.where(present, cents, 0).astype('int64'),
+        present,
+        totals.astype('int64'),
+        np.where(valid, weights, 0).astype('int64')
+    )
+
+
+NUMERIC_BACKENDS = {'fixed': compute_fixed, 'float': compute_float}
+
+
+def inception_prices(asset_ids):
+    first = AssetPrice.objects.filter(asset_id=OuterRef('id')).order_by('date')
+    rows = Asset.objects.filter(id__in=asset_ids).annotate(
+        first_date=Subquery(first.values('date')[:1]),
+        first_price=Subquery(first.values('price')[:1])
+    ).values_list('id', 'first_date', 'first_price')
+    return {aid: (first_date, Decimal(str(price)).quantize(PRICE_STEP)) for aid, first_date, price in rows if first_date is not None}
+
+
+def initial_book(portfolio, observations=None):
+    # C_i,0 persistido por (portafolio, activo); se recalcula si falta o si cambió el peso, el valor inicial o el precio t0
+    weights = dict(PortfolioWeight.objects.filter(portfolio=portfolio).values_list('asset_id', 'weight'))
+    firsts = observations(list(weights)) if observations is not None else inception_prices(list(weights))
+    book = {
+        row.asset_id: row
+        for row in InitialQuantity.objects.filter(portfolio=portfolio)
+        if weights.get(row.asset_id) == row.weight
+        and row.initial_value == portfolio.initial_value
+        and firsts.get(row.asset_id) == (row.inception_date, row.inception_price)
+    }
+    missing = [aid for aid in weights if aid not in book and aid in firsts]
+    if not missing:
+        return book
+    rows = [
+        InitialQuantity(
+            portfolio=portfolio,
+            asset_id=aid,
+            weight=weights[aid],
+            initial_value=portfolio.initial_value,
+            inception_date=firsts[aid][0],
+            inception_price=firsts[aid][1],
+            quantity=((weights[aid] * portfolio.initial_value) / firsts[aid][1]).quantize(QUANTITY_STEP)
+        )
+        for aid in missing
+    ]
+    InitialQuantity.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['portfolio', 'asset'],
+        update_fields=['weight', 'initial_value', 'inception_date', 'inception_price', 'quantity', 'computed_at']
+    )
+    book.update((row.asset_id, row) for row in rows)
+    return book
+
+
+def invalidate_initial_book(asset_ids, start_date):
+    # un precio nuevo o modificado en o antes de la fecha de inicio cambia C_i,0
+    return InitialQuantity.objects.filter(asset_id__in=asset_ids, inception_date__gte=start_date).delete()[0]
+
+
+class HoldingsEngine:
+    def __init__(self, prices=None, backend=None):
+        self.prices = prices if prices is not None else PriceMatrix.load()
+        self.backend = backend or settings.HOLDINGS_NUMERIC_BACKEND
+        if self.backend not in NUMERIC_BACKENDS:
+            raise ValueError(f"Backend numérico desconocido: {self.backend}")
+        self._first_prices = None
+
+    def first_prices(self, asset_ids):
+        if self._first_prices is None:
+            self._first_prices = {
+                aid: (first_date, to_decimal(price, PRICE_STEP))
+                for aid, (first_date, price) in self.prices.first_observations().items()
+            }
+        return self._first_prices
+
+    def initial_quantities(self, portfolio):
+        return {aid: row.quantity for aid, row in initial_book(portfolio, self.first_prices).items()}
+
+    def compute(self, quantities, prices):
+        return NUMERIC_BACKENDS[self.backend](quantities.to_numpy(dtype='float64'), prices.to_numpy(dtype='float64'))
+
+    def build_holdings(self, portfolio, quantities, prices):
+        q, cents, present, totals, weights = self.compute(quantities, prices)
+        valid = present & (totals != 0)[:, None]
+        dates = list(prices.index)
+        asset_ids = list(prices.columns)
+        values = [
+            PortfolioValue(portfolio=portfolio, date=dates[i], total_value=Decimal(int(totals[i])).scaleb(-2))
+            for i in np.flatnonzero(totals != 0)
+        ]
+        quantity_cache = {}
+        holdings = []
+        for i, j in zip(*np.nonzero(valid)):
+            qty = quantity_cache.get(q[i, j])
+            if qty is None:
+                qty = quantity_cache[q[i, j]] = Decimal(int(q[i, j])).scaleb(-6)
+            holdings.append(PortfolioHolding(
+                portfolio=portfolio,
+                asset_id=asset_ids[j],
+                date=dates[i],
+                quantity=qty,
+                amount=Decimal(int(cents[i, j])).scaleb(-2),
+                weight=Decimal(int(weights[i, j])).scaleb(-6)
+            ))
+        return holdings, values
+
+    def constant_quantities(self, quantities, prices):
+        row = pd.Series({aid: float(qty) for aid, qty in quantities.items()}, dtype='float64')
+        return pd.DataFrame(
+            np.broadcast_to(row.reindex(prices.columns).to_numpy(), prices.shape),
+            index=prices.index,
+            columns=prices.columns
+        )
+
+    def replay(self, quantities, transactions):
+        # orden (fecha, id) y tope en cero por transacción; único lugar donde se aplican transacciones
+        states = {}
+        for t in transactions:
+            current_qty = quantities.get(t.asset_id, Decimal('0'))
+            if t.transaction_type == 'BUY':
+                quantities[t.asset_id] = (current_qty + t.quantity).quantize(QUANTITY_STEP)
+            else:
+                quantities[t.asset_id] = max((current_qty - t.quantity).quantize(QUANTITY_STEP), Decimal('0'))
+            states[t.date] = dict(quantities)
+        return states
+
+    def quantities_before(self, portfolio, start_date):
+        # última cantidad guardada por activo antes de start_date, sea cual sea su fecha
+        holdings = PortfolioHolding.objects.filter(portfolio=portfolio, date__lt=start_date)
+        latest = holdings.filter(asset_id=OuterRef('asset_id')).order_by('-date').values('date')[:1]
+        rows = list(holdings.filter(date=Subquery(latest)).values_list('asset_id', 'date', 'quantity'))
+        quantities = {aid: quantity for aid, _, quantity in rows}
+        seen = {aid: row_date for aid, row_date, _ in rows}
+        for aid, quantity in self.initial_quantities(portfolio).items():
+            quantities.setdefault(aid, quantity)
+        # las transacciones posteriores a la última fila de cada activo (p. ej. en días sin precio) aún no están aplicadas
+        pending = Transaction.objects.filter(portfolio=portfolio, date__lt=start_date)
+        if seen:
+            pending = pending.filter(Q(date__gt=min(seen.values())) | ~Q(asset_id__in=list(seen)))
+        self.replay(quantities, [t for t in pending.order_by('date', 'id') if t.date > seen.get(t.asset_id, date.min)])
+        return quantities
+
+    def upsert(self, holdings, values):
+        record_rows(len(holdings))
+        with db_transaction.atomic():
+            bulk_write(
+                PortfolioHolding,
+                holdings,
+                BULK_BATCH_SIZE,
+                unique_fields=['portfolio', 'asset', 'date'],
+                update_fields=['quantity', 'amount', 'weight']
+            )
+            PortfolioValue.objects.bulk_create(
+                values,
+                batch_size=BULK_BATCH_SIZE,
+                update_conflicts=True,
+                unique_fields=['portfolio', 'date'],
+                update_fields=['total_value']
+            )
+            bump_data_version()
+
+    def apply_transactions(self, portfolio, transactions):
+        if not transactions:
+            return 0
+        return self.recompute_from(portfolio, min(t.date for t in transactions))
+
+    def recompute_from(self, portfolio, start_date):
+        # parte de lo guardado antes de start_date y reaplica solo las transacciones del tramo recalculado
+        quantities = self.quantities_before(portfolio, start_date)
+        states = {start_date: dict(quantities)}
+        states.update(self.replay(quantities, Transaction.objects.filter(portfolio=portfolio, date__gte=start_date).order_by('date', 'id')))
+        states = pd.DataFrame.from_dict(
+            {d: {aid: float(qty) for aid, qty in state.items()} for d, state in states.items()},
+            orient='index',
+            dtype='float64'
+        ).fillna(0).sort_index()
+        asset_ids = sorted(states.columns)
+        prices = self.prices.window(asset_ids, start_date)
+        quantities = states.reindex(columns=asset_ids).reindex(states.index.union(prices.index)).ffill()
+        quantities = quantities.reindex(prices.index).fillna(0).round(6)
+        holdings, values = self.build_holdings(portfolio, quantities, prices)
+        self.upsert(holdings, values)
+        return len(holdings)
+
+    def recalculate(self, portfolio, transaction_date):
+        quantities = self.quantities_before(portfolio, transaction_date)
+        self.replay(quantities, Transaction.objects.filter(portfolio=portfolio, date=transaction_date).order_by('id'))
+        prices = self.prices.window(list(quantities.keys()), transaction_date)
+        holdings, values = self.build_holdings(portfolio, self.constant_quantities(quantities, prices), prices)
+        self.upsert(holdings, values)
+        return len(holdings)
+
+    def needs_rebuild(self, portfolio, start_date):
+        first_dates = self.prices.first_dates()
+        inception = max(
+            (first_dates[aid] for aid in PortfolioWeight.objects.filter(portfolio=portfolio).values_list('asset_id', flat=True) if aid in first_dates),
+            default=None
+        )
+        if inception is None or start_date <= inception:
+            return True
+        return not PortfolioHolding.objects.filter(portfolio=portfolio, date__lt=start_date).exists()
+
+    def build_initial(self, portfolio, initial_quantities):
+        prices = self.prices.window(list(initial_quantities.keys()))
+        return self.build_holdings(portfolio, self.constant_quantities(initial_quantities, prices), prices)
+
+    def rebuild(self, portfolio, with_transactions=False):
+        holdings, values = self.build_initial(portfolio, self.initial_quantities(portfolio))
+        return self.replace(portfolio, holdings, values, with_transactions)
+
+    def replace(self, portfolio, holdings, values, with_transactions=False):
+        record_rows(len(holdings))
+        with db_transaction.atomic():
+            PortfolioHolding.objects.filter(portfolio=portfolio).delete()
+            PortfolioValue.objects.filter(portfolio=portfolio).delete()
+            bulk_write(PortfolioHolding, holdings, BULK_BATCH_SIZE, unique_fields=['portfolio', 'asset', 'date'], ignore_conflicts=True)
+            PortfolioValue.objects.bulk_create(values, batch_size=BULK_BATCH_SIZE)
+            bump_data_version()
+            if with_transactions:
+                self.apply_transactions(portfolio, list(Transaction.objects.filter(portfolio=portfolio)))
+        return len(holdings)
+
+    def rebuild_all(self, portfolios, with_transactions=False, workers=1):
+        if workers <= 1 or len(portfolios) < 2:
+            for portfolio in portfolios:
+                yield portfolio, self.rebuild(portfolio, with_transactions)
+            return
+        # los workers solo calculan; este proceso es el único que escribe en la base
+        tasks = [(portfolio, self.initial_quantities(portfolio)) for portfolio in portfolios]
+        for portfolio, (holdings, values) in build_in_pool(self.prices, tasks, min(workers, len(tasks)), self.backend):
+            yield portfolio, self.replace(portfolio, holdings, values, with_transactions)
@@ -0,0 +1,304 @@
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import OperationalError, connection, transaction as db_transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .database import lock_table
+from .etl import PortfolioETL
+from .models import Job
+from .progress import ConsoleHook, JSONReportHook
+from .readers import DEFAULT_CHUNK_SIZE
+
+ALL_PORTFOLIOS = '*'
+
+_running = set()
+_running_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobProgressHook(JSONReportHook):
+    def __init__(self, job_id):
+        super().__init__()
+        self.job_id = job_id
+        self.stage = None
+        self.last_message = ''
+
+    def message(self, text):
+        self.last_message = text
+        self.save()
+
+    def stage_started(self, stage):
+        super().stage_started(stage)
+        self.stage = stage
+        self.save()
+
+    def stage_finished(self, stage, measurement, error=None):
+        super().stage_finished(stage, measurement, error)
+        # la etapa ya terminó (y pudo confirmar datos); aquí solo se publica el avance
+        self.save(check_cancel=False)
+
+    def progress(self):
+        return {'stage': self.stage, 'message': self.last_message, **self.report()}
+
+    def save(self, check_cancel=True):
+        # dentro de una transacción del ETL el avance no sería visible hasta el commit; se publica en el siguiente punto
+        if connection.in_atomic_block:
+            return
+        jobs = Job.objects.filter(pk=self.job_id)
+        if check_cancel:
+            jobs = jobs.filter(cancel_requested=False)
+        try:
+            updated = jobs.update(progress=self.progress(), heartbeat_at=timezone.now())
+        except OperationalError:
+            # el avance es informativo; una base ocupada no debe hacer fallar el job
+            return
+        if check_cancel and not updated:
+            raise JobCancelled('Job cancelado')
+
+
+@contextmanager
+def heartbeat(job_id):
+    # latido desde un hilo con su propia conexión, así las etapas largas dentro de una transacción siguen vivas
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_HEARTBEAT_SECONDS):
+                try:
+                    Job.objects.filter(pk=job_id, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+                except OperationalError:
+                    # en SQLite otra escritura puede tener la base tomada; se reintenta en el siguiente latido
+                    pass
+        finally:
+            connection.close()
+
+    with _running_lock:
+        _running.add(job_id)
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+        with _running_lock:
+            _running.discard(job_id)
+
+
+def data_file(name):
+    # las rutas de la API se resuelven dentro de JOB_DATA_DIR; '..', enlaces y rutas absolutas fuera de él se rechazan
+    root = Path(settings.JOB_DATA_DIR).resolve()
+    path = (root / str(name)).resolve()
+    if not path.is_relative_to(root):
+        raise ValueError(f"El archivo debe estar dentro del directorio de datos: {name}")
+    if not path.is_file():
+        raise ValueError(f"Archivo no encontrado: {name}")
+    return str(path)
+
+
+def run_load_data(params, hooks):
+    etl = PortfolioETL(
+        data_file(params['excel_file']),
+        weights_file_path=data_file(params['weights_file']) if params.get('weights_file') else None,
+        chunk_size=params.get('chunk_size', DEFAULT_CHUNK_SIZE),
+        workers=params.get('workers', 1),
+        hooks=hooks
+    )
+    if params.get('incremental'):
+        return {'changed_dates': len(etl.load_data(incremental=True))}
+    etl.load_data()
+    return {}
+
+
+def run_process_transactions(params, hooks):
+    transactions = PortfolioETL(hooks=hooks).process_transactions(params['trades'])
+    return {'transactions': len(transactions)}
+
+
+def run_rebuild_holdings(params, hooks):
+    PortfolioETL(workers=params.get('workers', 1), hooks=hooks).calculate_holdings(
+        with_transactions=params.get('with_transactions', True)
+    )
+    return {}
+
+
+JOB_KINDS = {
+    'load_data': run_load_data,
+    'process_transactions': run_process_transactions,
+    'rebuild_holdings': run_rebuild_holdings,
+}
+
+
+def job_portfolios(kind, params):
+    if kind == 'process_transactions':
+        return sorted({str(trade.get('portfolio', '')).strip() for trade in params['trades']})
+    # la carga y el recálculo completo tocan todos los portafolios
+    return [ALL_PORTFOLIOS]
+
+
+def enqueue(kind, params=None, max_attempts=None):
+    params = params or {}
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Tipo de job desconocido: {kind}")
+    if kind == 'load_data' and not params.get('excel_file'):
+        raise ValueError('load_data requiere excel_file')
+    if kind == 'load_data':
+        for key in ('excel_file', 'weights_file'):
+            if params.get(key):
+                data_file(params[key])
+    if kind == 'process_transactions' and not isinstance(params.get('trades'), list):
+        raise ValueError('process_transactions requiere una lista trades')
+    if kind == 'process_transactions' and not all(isinstance(trade, dict) for trade in params['trades']):
+        raise ValueError('Cada transacción debe ser un objeto')
+    return Job.objects.create(
+        kind=kind,
+        params=params,
+        portfolios=job_portfolios(kind, params),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS
+    )
+
+
+def overlaps(a, b):
+    return ALL_PORTFOLIOS in a or ALL_PORTFOLIOS in b or bool(set(a) & set(b))
+
+
+def claim(worker):
+    now = timezone.now()
+    with db_transaction.atomic():
+        lock_table(Job)
+        with _running_lock:
+            running_here = list(_running)
+        # los jobs que este proceso está ejecutando nunca se reencolan, aunque su latido no haya podido escribirse
+        Job.objects.filter(
+            status=Job.RUNNING,
+            heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+        ).exclude(pk__in=running_here).update(status=Job.PENDING, worker='')
+        busy = [portfolios for portfolios in Job.objects.filter(status=Job.RUNNING).values_list('portfolios', flat=True)]
+        for job in Job.objects.filter(status=Job.PENDING).order_by('id'):
+            blocked = any(overlaps(job.portfolios, portfolios) for portfolios in busy)
+            # un job en espera también bloquea a los posteriores del mismo portafolio, así se respeta el orden
+            busy.append(job.portfolios)
+            if blocked or (job.run_after and job.run_after > now):
+                continue
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.RUNNING,
+                worker=worker,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1
+            )
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def finish(job, **fields):
+    Job.objects.filter(pk=job.pk).update(finished_at=timezone.now(), **fields)
+
+
+def run_job(job, write=print):
+    progress = JobProgressHook(job.pk)
+    hooks = [ConsoleHook(lambda text: write(f"[job {job.pk}] {text}")), progress]
+    try:
+        with heartbeat(job.pk):
+            result = JOB_KINDS[job.kind](job.params, hooks)
+    except JobCancelled:
+        finish(job, status=Job.CANCELLED, progress=progress.progress())
+        write(f"[job {job.pk}] cancelado")
+        return Job.CANCELLED
+    except Exception as e:
+        # los errores de validación (ValueError) no se reintentan
+        error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        if not isinstance(e, ValueError) and job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                error=error,
+                progress=progress.progress(),
+                run_after=timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY_SECONDS * job.attempts)
+            )
+            write(f"[job {job.pk}] error, se reintentará ({job.attempts}/{job.max_attempts}): {error}")
+            return Job.PENDING
+        finish(job, status=Job.FAILED, error=traceback.format_exc(), progress=progress.progress())
+        write(f"[job {job.pk}] falló: {error}")
+        return Job.FAILED
+    finish(job, status=Job.SUCCEEDED, result=result, progress=progress.progress())
+    write(f"[job {job.pk}] completado")
+    return Job.SUCCEEDED
+
+
+def cancel(job_id):
+    Job.objects.get(pk=job_id)
+    if Job.objects.filter(pk=job_id, status=Job.PENDING).update(status=Job.CANCELLED, cancel_requested=True, finished_at=timezone.now()):
+        return Job.CANCELLED
+    # un job en ejecución se detiene en el siguiente punto de avance
+    if Job.objects.filter(pk=job_id, status=Job.RUNNING).update(cancel_requested=True):
+        return Job.RUNNING
+    raise ValueError('El job ya terminó')
+
+
+def retry(job_id):
+    Job.objects.get(pk=job_id)
+    updated = Job.objects.filter(pk=job_id, status__in=[Job.FAILED, Job.CANCELLED]).update(
+        status=Job.PENDING,
+        cancel_requested=False,
+        error='',
+        run_after=None,
+        finished_at=None,
+        max_attempts=Greatest(F('max_attempts'), F('attempts') + 1)
+    )
+    if not updated:
+        raise ValueError('Solo se pueden reintentar jobs fallidos o cancelados')
+
+
+def worker_name(slot):
+    return f"{socket.gethostname()}:{os.getpid()}:{slot}"
+
+
+def work(slots=1, once=False, poll_seconds=None, write=print):
+    poll_seconds = settings.JOB_POLL_SECONDS if poll_seconds is None else poll_seconds
+    stop = threading.Event()
+    processed = []
+
+    def slot(index):
+        name = worker_name(index)
+        try:
+            while not stop.is_set():
+                try:
+                    job = claim(name)
+                except OperationalError as e:
+                    # la base puede estar bloqueada por la transacción larga de otro job
+                    write(f"[{name}] cola ocupada: {e}")
+                    job = None
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(poll_seconds)
+                    continue
+                write(f"[{name}] job {job.pk} ({job.kind}, intento {job.attempts}/{job.max_attempts})")
+                processed.append(run_job(job, write))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=slot, args=(i,), daemon=True) for i in range(slots)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(0.5)
+    except KeyboardInterrupt:
+        write('Deteniendo workers al terminar los jobs en curso...')
+        stop.set()
+        for thread in threads:
+            thread.join()
+    return processed
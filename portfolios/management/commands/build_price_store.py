@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+from portfolios.prices import refresh_price_store
+
+
+class Command(BaseCommand):
+    help = 'Regenerate the memory-mapped price store from AssetPrice rows'
+
+    def handle(self, *args, **options):
+        directory = refresh_price_store(new_version=True)
+        if directory is None:
+            raise CommandError('PRICE_STORE_DIR no está configurado')
+        self.stdout.write(self.style.SUCCESS(f"Almacén de precios generado en {directory}"))
@@ -0,0 +1,42 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from portfolios.export import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, EXPORTS, parse_date, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream holdings or portfolio values to NDJSON, CSV or Parquet with constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS), help='Data to export')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson', help='Output format')
+        parser.add_argument('--output', type=str, default=None, help='Output file (stdout when omitted)')
+        parser.add_argument('--fecha-inicio', type=str, default=None, help='First date (YYYY-MM-DD)')
+        parser.add_argument('--fecha-fin', type=str, default=None, help='Last date (YYYY-MM-DD)')
+        parser.add_argument('--portfolio', type=str, default=None, help='Portfolio name')
+        parser.add_argument('--asset', type=str, default=None, help='Asset symbol (holdings only)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched and written per chunk')
+
+    def handle(self, *args, **options):
+        try:
+            chunks = stream_export(
+                options['kind'],
+                options['format'],
+                chunk_size=options['chunk_size'],
+                fecha_inicio=parse_date(options['fecha_inicio']),
+                fecha_fin=parse_date(options['fecha_fin']),
+                portfolio=options['portfolio'],
+                asset=options['asset']
+            )
+        except (ValueError, ImportError) as e:
+            raise CommandError(str(e))
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Exportados {written:,} bytes a {options['output']}"))
@@ -1,20 +1,51 @@
 from django.core.management.base import BaseCommand
 from portfolios.etl import PortfolioETL
+from portfolios.progress import ConsoleHook, JSONReportHook, ProfilerHook
+from portfolios.readers import DEFAULT_CHUNK_SIZE
 from datetime import datetime
 from decimal import Decimal
-from portfolios.models import Portfolio, AssetPrice, PortfolioHolding
+from portfolios.models import Portfolio, AssetPrice, PortfolioHolding, PortfolioValue
 
 
 class Command(BaseCommand):
     help = 'Load portfolio data from Excel file'
 
     def add_arguments(self, parser):
-        parser.add_argument('excel_file', type=str, help='Path to Excel file')
+        parser.add_argument('excel_file', type=str, help='Path to Excel (.xlsx), CSV or Parquet price file')
+        parser.add_argument('--weights', type=str, default=None, help='Weights file when prices are not an Excel workbook')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Price rows read per batch')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to compute holdings in parallel')
+        parser.add_argument('--report', type=str, default=None, help='Write a JSON report with per-stage durations, rows and throughput')
+        parser.add_argument('--profile', type=str, default=None, help='Directory for one profile per ETL stage')
+        parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+        parser.add_argument('--incremental', action='store_true', help='Load only new or changed dates and recalculate from the earliest one')
 
     def handle(self, *args, **options):
+        report = JSONReportHook()
+        hooks = [ConsoleHook(self.stdout.write, stages=True), report]
+        if options['profile']:
+            hooks.append(ProfilerHook(options['profile'], options['profiler']))
+        try:
+            self.load(options, hooks)
+        finally:
+            if options['report']:
+                report.write(options['report'])
+                self.stdout.write(f"Reporte de etapas guardado en {options['report']}")
+
+    def load(self, options, hooks):
         excel_file = options['excel_file']
-        etl = PortfolioETL(excel_file)
+        etl = PortfolioETL(
+            excel_file,
+            weights_file_path=options['weights'],
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            hooks=hooks
+        )
         self.stdout.write('Cargando datos...')
+        if options['incremental']:
+            changed_dates = etl.load_data(incremental=True)
+            self.stdout.write(self.style.SUCCESS(f"Carga incremental completada: {len(changed_dates)} fechas actualizadas"))
+            return
         etl.load_data()
         self.stdout.write(self.style.SUCCESS('Datos cargados correctamente'))
         initial_price = AssetPrice.objects.order_by('date').first()
@@ -22,7 +53,7 @@ class Command(BaseCommand):
             fecha_inicial = initial_price.date
             p1 = Portfolio.objects.get(name='Portfolio 1')
             holdings_ini = PortfolioHolding.objects.filter(portfolio=p1, date=fecha_inicial)
-            total_ini = sum(h.amount for h in holdings_ini)
+            total_ini = PortfolioValue.objects.filter(portfolio=p1, date=fecha_inicial).values_list('total_value', flat=True).first()
             self.stdout.write(f"Fecha inicial: {fecha_inicial}")
             self.stdout.write(f"Portafolio 1 V0 calculado: {total_ini}")
             for h in holdings_ini.order_by('asset__symbol')[:5]:
@@ -40,7 +71,7 @@ class Command(BaseCommand):
         fecha_tx = datetime(2022, 5, 15).date()
         p1 = Portfolio.objects.get(name='Portfolio 1')
         holdings_tx = PortfolioHolding.objects.filter(portfolio=p1, date=fecha_tx)
-        total_tx = sum(h.amount for h in holdings_tx)
+        total_tx = PortfolioValue.objects.filter(portfolio=p1, date=fecha_tx).values_list('total_value', flat=True).first()
         self.stdout.write(f"Fecha transacción: {fecha_tx} Vt: {total_tx}")
         for h in holdings_tx.order_by('asset__symbol')[:5]:
             self.stdout.write(f"{h.asset.symbol}: cantidad={h.quantity} monto={h.amount} weight={h.weight}")
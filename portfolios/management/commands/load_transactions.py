@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from portfolios.etl import PortfolioETL
+from portfolios.readers import read_trades
+
+
+class Command(BaseCommand):
+    help = 'Apply a batch of transactions from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('trades_file', type=str, help='Path to CSV/JSONL file with portfolio, asset, transaction_type, amount, date')
+
+    def handle(self, *args, **options):
+        trades = read_trades(options['trades_file'])
+        self.stdout.write(f"Transacciones leídas: {len(trades)}")
+        try:
+            transactions = PortfolioETL().process_transactions(trades)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Transacciones procesadas: {len(transactions)}"))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from portfolios.etl import PortfolioETL
+
+
+class Command(BaseCommand):
+    help = 'Rebuild holdings and portfolio values from stored prices and weights'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to compute holdings in parallel')
+        parser.add_argument('--skip-transactions', action='store_true', help='Do not re-apply stored transactions')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Recalculando holdings...')
+        PortfolioETL(workers=options['workers']).calculate_holdings(with_transactions=not options['skip_transactions'])
+        self.stdout.write(self.style.SUCCESS('Holdings recalculados'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from portfolios.jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Run queued ETL jobs; jobs on different portfolios run concurrently, jobs on the same portfolio in order'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--slots', type=int, default=2, help='Jobs executed at the same time by this worker')
+        parser.add_argument('--once', action='store_true', help='Exit when there are no runnable jobs left')
+        parser.add_argument('--poll', type=float, default=None, help='Seconds between queue polls (JOB_POLL_SECONDS)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Worker de jobs con {options['slots']} slots")
+        processed = work(options['slots'], options['once'], options['poll'], self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f"Jobs procesados: {len(processed)}"))
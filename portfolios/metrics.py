@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from django.conf import settings
+
+logger = logging.getLogger('portfolios.db')
+
+FIELDS = ('count', 'seconds', 'db_queries', 'db_seconds', 'serialize_seconds', 'rows')
+SERIES = {
+    'http': ('portfolio_http', 'requests', 'Requests served by the API'),
+    'etl': ('portfolio_etl', 'runs', 'ETL stage executions'),
+}
+
+_active = ContextVar('portfolio_measurements', default=())
+_lock = threading.Lock()
+_registry = {}
+
+
+class Measurement:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.render_started = None
+        self.rows = 0
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_queries} queries"',
+            f'serialize;dur={self.serialize_seconds * 1000:.1f}',
+            f'rows;desc="{self.rows}"',
+            f'total;dur={self.seconds * 1000:.1f}',
+        ])
+
+
+def record_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for measurement in _active.get():
+            measurement.db_queries += 1
+            measurement.db_seconds += elapsed
+        threshold = settings.SLOW_QUERY_MS
+        if threshold is not None and elapsed * 1000 >= threshold:
+            logger.warning('Consulta lenta (%.1f ms): %s', elapsed * 1000, sql[:1000])
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure():
+    measurement = Measurement()
+    token = _active.set(_active.get() + (measurement,))
+    try:
+        yield measurement
+    finally:
+        _active.reset(token)
+        measurement.seconds = time.perf_counter() - measurement.started
+
+
+def current():
+    active = _active.get()
+    return active[-1] if active else None
+
+
+@contextmanager
+def timed_serialization():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for measurement in _active.get():
+            measurement.serialize_seconds += elapsed
+
+
+def record_rows(count):
+    for measurement in _active.get():
+        measurement.rows += count
+
+
+def observe(kind, labels, measurement):
+    key = (kind, tuple(sorted(labels.items())))
+    with _lock:
+        totals = _registry.setdefault(key, dict.fromkeys(FIELDS, 0))
+        totals['count'] += 1
+        for field in FIELDS[1:]:
+            totals[field] += getattr(measurement, field)
+
+
+def etl_stage(stage):
+    def decorator(method):
+        @wraps(method)
+        def wrapper(etl, *args, **kwargs):
+            hooks = getattr(etl, 'hooks', ())
+            for hook in hooks:
+                hook.stage_started(stage)
+            error = None
+            try:
+                with measure() as measurement:
+                    return method(etl, *args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                observe('etl', {'stage': stage}, measurement)
+                for hook in hooks:
+                    hook.stage_finished(stage, measurement, error)
+        return wrapper
+    return decorator
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    with _lock:
+        snapshot = {key: dict(totals) for key, totals in _registry.items()}
+    lines = []
+    for kind, (prefix, count_name, description) in SERIES.items():
+        samples = sorted(((labels, totals) for (k, labels), totals in snapshot.items() if k == kind), key=lambda item: item[0])
+        for field, name, help_text in [
+            ('count', f"{prefix}_{count_name}_total", description),
+            ('seconds', f"{prefix}_seconds_total", 'Wall time in seconds'),
+            ('db_queries', f"{prefix}_db_queries_total", 'Database queries executed'),
+            ('db_seconds', f"{prefix}_db_seconds_total", 'Time spent in database queries'),
+            ('serialize_seconds', f"{prefix}_serialize_seconds_total", 'Time spent serializing and rendering'),
+            ('rows', f"{prefix}_rows_total", 'Rows returned or written'),
+        ]:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, totals in samples:
+                label_text = ','.join(f'{key}="{escape_label(value)}"' for key, value in labels)
+                value = totals[field]
+                lines.append(f"{name}{{{label_text}}} {round(value, 6) if isinstance(value, float) else value}")
+    return '\n'.join(lines) + '\n'
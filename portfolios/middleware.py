@@ -0,0 +1,48 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .metrics import current, measure, observe
+
+
+class QueryTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with measure() as measurement:
+            response = self.get_response(request)
+            self.finish_render(measurement)
+        return self.finish(request, response, measurement)
+
+    async def __acall__(self, request):
+        with measure() as measurement:
+            response = await self.get_response(request)
+            self.finish_render(measurement)
+        return self.finish(request, response, measurement)
+
+    def finish_render(self, measurement):
+        if measurement.render_started is not None:
+            measurement.serialize_seconds += time.perf_counter() - measurement.render_started
+
+    def finish(self, request, response, measurement):
+        match = request.resolver_match
+        observe('http', {
+            'route': match.url_name if match and match.url_name else 'unmatched',
+            'method': request.method,
+            'status': response.status_code
+        }, measurement)
+        response['Server-Timing'] = measurement.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF renderiza la respuesta justo después de este hook
+        measurement = current()
+        if measurement is not None:
+            measurement.render_started = time.perf_counter()
+        return response
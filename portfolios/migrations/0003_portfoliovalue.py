@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:00
+
+from django.db import migrations, models
+from django.db.models import Sum
+import django.db.models.deletion
+
+
+def populate_values(apps, schema_editor):
+    PortfolioHolding = apps.get_model('portfolios', 'PortfolioHolding')
+    PortfolioValue = apps.get_model('portfolios', 'PortfolioValue')
+    totals = PortfolioHolding.objects.values('portfolio_id', 'date').annotate(total_value=Sum('amount'))
+    PortfolioValue.objects.bulk_create(
+        [PortfolioValue(portfolio_id=t['portfolio_id'], date=t['date'], total_value=t['total_value']) for t in totals],
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0002_sheetfingerprint_pricerowfingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('total_value', models.DecimalField(decimal_places=2, max_digits=17)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolios.portfolio')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'date')},
+            },
+        ),
+        migrations.RunPython(populate_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0003_portfoliovalue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='assetprice',
+            index=models.Index(fields=['date'], name='price_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolioholding',
+            index=models.Index(fields=['date', 'portfolio', 'asset'], name='holding_date_port_asset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfolioholding',
+            index=models.Index(fields=['portfolio', 'date'], name='holding_port_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='portfoliovalue',
+            index=models.Index(fields=['date', 'portfolio'], name='value_date_port_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'date'], name='transaction_port_date_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0004_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InitialQuantity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.DecimalField(decimal_places=6, max_digits=8)),
+                ('inception_date', models.DateField()),
+                ('inception_price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('quantity', models.DecimalField(decimal_places=6, max_digits=15)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('asset', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolios.asset')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolios.portfolio')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'asset')},
+            },
+        ),
+    ]
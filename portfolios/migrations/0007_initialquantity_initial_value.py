@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolios', '0006_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='initialquantity',
+            name='initial_value',
+            field=models.DecimalField(decimal_places=2, max_digits=15, null=True),
+        ),
+    ]
@@ -25,6 +25,7 @@ class AssetPrice(models.Model):
 
     class Meta:
         unique_together = ['asset', 'date']
+        indexes = [models.Index(fields=['date'], name='price_date_idx')]
 
 
 class PortfolioWeight(models.Model):
@@ -36,6 +37,20 @@ class PortfolioWeight(models.Model):
         unique_together = ['portfolio', 'asset']
 
 
+class InitialQuantity(models.Model):
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE)
+    asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
+    weight = models.DecimalField(max_digits=8, decimal_places=6)
+    initial_value = models.DecimalField(max_digits=15, decimal_places=2, null=True)
+    inception_date = models.DateField()
+    inception_price = models.DecimalField(max_digits=12, decimal_places=4)
+    quantity = models.DecimalField(max_digits=15, decimal_places=6)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['portfolio', 'asset']
+
+
 class PortfolioHolding(models.Model):
     portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE)
     asset = models.ForeignKey(Asset, on_delete=models.CASCADE)
@@ -46,6 +61,20 @@ class PortfolioHolding(models.Model):
 
     class Meta:
         unique_together = ['portfolio', 'asset', 'date']
+        indexes = [
+            models.Index(fields=['date', 'portfolio', 'asset'], name='holding_date_port_asset_idx'),
+            models.Index(fields=['portfolio', 'date'], name='holding_port_date_idx'),
+        ]
+
+
+class PortfolioValue(models.Model):
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE)
+    date = models.DateField()
+    total_value = models.DecimalField(max_digits=17, decimal_places=2)
+
+    class Meta:
+        unique_together = ['portfolio', 'date']
+        indexes = [models.Index(fields=['date', 'portfolio'], name='value_date_port_idx')]
 
 
 class Transaction(models.Model):
@@ -55,3 +84,46 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=10, choices=[('BUY', 'Buy'), ('SELL', 'Sell')])
     amount = models.DecimalField(max_digits=15, decimal_places=2)
     quantity = models.DecimalField(max_digits=15, decimal_places=6)
+
+    class Meta:
+        indexes = [models.Index(fields=['portfolio', 'date'], name='transaction_port_date_idx')]
+
+
+class SheetFingerprint(models.Model):
+    sheet = models.CharField(max_length=50, unique=True)
+    digest = models.CharField(max_length=64)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class PriceRowFingerprint(models.Model):
+    date = models.DateField(unique=True)
+    digest = models.CharField(max_length=40)
+
+
+class Job(models.Model):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    SUCCEEDED = 'SUCCEEDED'
+    FAILED = 'FAILED'
+    CANCELLED = 'CANCELLED'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed'), (CANCELLED, 'Cancelled')]
+
+    kind = models.CharField(max_length=30)
+    params = models.JSONField(default=dict)
+    portfolios = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    progress = models.JSONField(default=dict)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=100, blank=True)
+    run_after = models.DateTimeField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    heartbeat_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'], name='job_status_idx')]
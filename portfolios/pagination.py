@@ -0,0 +1,82 @@
+import base64
+from collections import OrderedDict
+from datetime import datetime
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class HoldingKeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 10000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    ordering = ('date', 'portfolio_id', 'asset_id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.page(list(self.page_query(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.page([holding async for holding in self.page_query(queryset, request)])
+
+    def page_query(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position:
+            queryset = self.after(queryset, position)
+        return queryset[:self.page_size + 1]
+
+    def page(self, results):
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.last = results[-1] if results else None
+        return results
+
+    def after(self, queryset, position):
+        date, portfolio_id, asset_id = position
+        # el rango date >= cursor permite recorrer el índice (date, portfolio, asset) sin evaluar el OR fila a fila
+        return queryset.filter(date__gte=date).filter(
+            Q(date__gt=date)
+            | Q(date=date, portfolio_id__gt=portfolio_id)
+            | Q(date=date, portfolio_id=portfolio_id, asset_id__gt=asset_id)
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.GET.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            date, portfolio_id, asset_id = base64.urlsafe_b64decode(encoded.encode()).decode().split(':')
+            return datetime.strptime(date, '%Y-%m-%d').date(), int(portfolio_id), int(asset_id)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound('Cursor inválido')
+
+    def encode_cursor(self, holding):
+        position = f"{holding.date:%Y-%m-%d}:{holding.portfolio_id}:{holding.asset_id}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.encode_cursor(self.last))
+
+    def paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.paginated_data(data))
@@ -0,0 +1,65 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+import django
+import numpy as np
+import pandas as pd
+from django.apps import apps
+
+_worker = {}
+
+
+class SharedPriceMatrix:
+    def __init__(self, prices):
+        self.prices = prices
+
+    def __enter__(self):
+        values = self.prices.values
+        self.memory = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype='float64', buffer=self.memory.buf)[:] = values
+        return self
+
+    def __exit__(self, *exc):
+        self.memory.close()
+        self.memory.unlink()
+
+    def spec(self):
+        return self.memory.name, self.prices.values.shape, self.prices.dates, self.prices.asset_ids
+
+
+def attach_worker(name, shape, dates, asset_ids, backend):
+    # los workers se inician con spawn, así que configuran Django antes de importar modelos
+    if not apps.ready:
+        django.setup()
+    from .holdings import HoldingsEngine
+    from .prices import PriceWindow
+    memory = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype='float64', buffer=memory.buf)
+    _worker['memory'] = memory
+    _worker['engine'] = HoldingsEngine(
+        PriceWindow(pd.DataFrame(values, index=dates, columns=asset_ids, copy=False)),
+        backend
+    )
+
+
+def build_portfolio(task):
+    portfolio, quantities = task
+    return portfolio, _worker['engine'].build_initial(portfolio, quantities)
+
+
+def build_in_pool(prices, tasks, workers, backend):
+    with SharedPriceMatrix(prices) as shared:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context('spawn'),
+            initializer=attach_worker,
+            initargs=(*shared.spec(), backend)
+        ) as pool:
+            # como mucho un resultado por worker en espera, para no acumular holdings mientras escribe el proceso principal
+            pending = deque()
+            for task in tasks:
+                pending.append(pool.submit(build_portfolio, task))
+                if len(pending) > workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
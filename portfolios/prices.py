@@ -0,0 +1,129 @@
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from .cache import bump_data_version, price_version, write_price_version
+from .models import AssetPrice
+from .pricestore import read_price_store, write_price_store
+
+PRICE_STEP = Decimal('0.0001')
+
+_current_lock = threading.Lock()
+_current = {}
+
+
+def to_decimal(value, step):
+    return Decimal(repr(float(value))).quantize(step)
+
+
+def staleness_limit(staleness_days=None):
+    return settings.PRICE_STALENESS_DAYS if staleness_days is None else staleness_days
+
+
+def as_of_prices(asset_ids, date, staleness_days=None):
+    prices = PriceMatrix.current()
+    observations = ((aid, prices.observation(aid, date, staleness_days)) for aid in asset_ids)
+    return {aid: observation for aid, observation in observations if observation is not None}
+
+
+def price_frame():
+    rows = AssetPrice.objects.annotate(value=Cast('price', FloatField())).values_list('date', 'asset_id', 'value')
+    frame = pd.DataFrame.from_records(list(rows), columns=['date', 'asset_id', 'price'])
+    if frame.empty:
+        return pd.DataFrame(dtype='float64')
+    return frame.pivot(index='date', columns='asset_id', values='price').sort_index()
+
+
+def refresh_price_store(new_version=False):
+    # la versión se toma antes de leer: si los precios cambian entremedio el almacén queda descartado, no obsoleto
+    if new_version:
+        write_price_version()
+    version = price_version()
+    return write_price_store(price_frame(), version)
+
+
+def prices_changed():
+    # al confirmar: nueva versión de precios, invalidación de la caché de la API y almacén regenerado, en ese orden
+    db_transaction.on_commit(write_price_version)
+    bump_data_version()
+    db_transaction.on_commit(refresh_price_store)
+
+
+class PriceWindow:
+    # precios ya filtrados por antigüedad, solo para calcular holdings; es lo que reciben los workers en memoria compartida
+    def __init__(self, frame):
+        self.frame = frame
+        self.values = frame.to_numpy(dtype='float64', copy=False)
+        self.dates = list(frame.index)
+        self.asset_ids = list(frame.columns)
+        self.columns = {aid: j for j, aid in enumerate(self.asset_ids)}
+
+    def window(self, asset_ids, start_date=None):
+        frame = self.frame.reindex(columns=asset_ids)
+        if start_date is not None:
+            frame = frame.loc[frame.index >= start_date]
+        return frame
+
+
+class PriceMatrix(PriceWindow):
+    def __init__(self, frame, staleness_days=None):
+        self.raw = frame
+        self.staleness_days = staleness_limit(staleness_days)
+        index = pd.to_datetime(pd.Index(list(frame.index))).values.astype('datetime64[D]')
+        observed = frame.notna().to_numpy()
+        self.last_seen = pd.DataFrame(
+            np.where(observed, index[:, None], np.datetime64('NaT', 'D'))
+        ).ffill().to_numpy(dtype='datetime64[D]')
+        self.filled = frame.ffill().to_numpy(dtype='float64')
+        with np.errstate(invalid='ignore'):
+            fresh = (index[:, None] - self.last_seen) <= np.timedelta64(self.staleness_days, 'D')
+        super().__init__(pd.DataFrame(np.where(fresh, self.filled, np.nan), index=frame.index, columns=frame.columns))
+
+    @classmethod
+    def load(cls, staleness_days=None, version=None):
+        # el almacén evita el recorrido del ORM; las matrices con ffill se derivan igual en memoria
+        frame = read_price_store(version or price_version())
+        if frame is None:
+            frame = price_frame()
+        return cls(frame, staleness_days)
+
+    @classmethod
+    def current(cls):
+        # instancia compartida por el proceso para las consultas de la API; se recarga cuando cambian los precios
+        version = price_version()
+        with _current_lock:
+            if _current.get('version') != version:
+                _current['matrix'] = cls.load(version=version)
+                _current['version'] = version
+            return _current['matrix']
+
+    def first_observations(self):
+        if not self.asset_ids:
+            return {}
+        raw = self.raw.to_numpy(dtype='float64')
+        present = ~np.isnan(raw)
+        first = present.argmax(axis=0)
+        return {aid: (self.dates[first[j]], raw[first[j], j]) for j, aid in enumerate(self.asset_ids) if present[first[j], j]}
+
+    def first_dates(self):
+        return {aid: date for aid, (date, _) in self.first_observations().items()}
+
+    def observation(self, asset_id, date, staleness_days=None):
+        staleness_days = self.staleness_days if staleness_days is None else staleness_days
+        j = self.columns.get(asset_id)
+        position = bisect_right(self.dates, date) - 1
+        if j is None or position < 0:
+            return None
+        seen = self.last_seen[position, j]
+        if np.isnat(seen) or np.datetime64(date, 'D') - seen > np.timedelta64(staleness_days, 'D'):
+            return None
+        return to_decimal(self.filled[position, j], PRICE_STEP), seen.astype(object)
+
+    def as_of(self, asset_id, date):
+        observation = self.observation(asset_id, date)
+        return observation[0] if observation is not None else None
@@ -0,0 +1,63 @@
+import json
+import os
+import uuid
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+STORE_FILES = ('dates', 'assets', 'prices')
+
+
+def store_dir():
+    directory = settings.PRICE_STORE_DIR
+    return Path(directory) if directory else None
+
+
+def replace_file(path, write):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def write_price_store(frame, version):
+    directory = store_dir()
+    if directory is None:
+        return None
+    directory.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        'dates': np.array(frame.index, dtype='datetime64[D]'),
+        'assets': frame.columns.to_numpy(dtype='int64'),
+        'prices': frame.to_numpy(dtype='float64')
+    }
+    for name in STORE_FILES:
+        replace_file(directory / f"{name}.npy", lambda f: np.save(f, arrays[name]))
+    manifest = {
+        'version': version,
+        'shape': list(arrays['prices'].shape)
+    }
+    # el manifiesto se escribe al final: un lector nunca ve matrices a medio reemplazar como válidas
+    replace_file(directory / 'manifest.json', lambda f: f.write(json.dumps(manifest).encode()))
+    return directory
+
+
+def read_price_store(version):
+    directory = store_dir()
+    if directory is None:
+        return None
+    try:
+        manifest = json.loads((directory / 'manifest.json').read_text())
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode='r') for name in STORE_FILES}
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get('version') != version:
+        return None
+    if list(arrays['prices'].shape) != manifest['shape'] or arrays['prices'].shape != (len(arrays['dates']), len(arrays['assets'])):
+        return None
+    return pd.DataFrame(
+        arrays['prices'],
+        index=pd.Index(arrays['dates'].astype(object)),
+        columns=pd.Index(arrays['assets']),
+        copy=False
+    )
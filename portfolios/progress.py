@@ -0,0 +1,115 @@
+import cProfile
+import json
+import time
+from pathlib import Path
+
+
+class ETLHook:
+    def message(self, text):
+        pass
+
+    def stage_started(self, stage):
+        pass
+
+    def stage_finished(self, stage, measurement, error=None):
+        pass
+
+
+def stage_event(stage, measurement, error=None):
+    return {
+        'stage': stage,
+        'seconds': round(measurement.seconds, 6),
+        'rows': measurement.rows,
+        'rows_per_second': round(measurement.rows / measurement.seconds, 1) if measurement.seconds else None,
+        'db_queries': measurement.db_queries,
+        'db_seconds': round(measurement.db_seconds, 6),
+        'error': str(error) if error else None,
+    }
+
+
+class ConsoleHook(ETLHook):
+    def __init__(self, write=print, stages=False):
+        self.write = write
+        self.stages = stages
+
+    def message(self, text):
+        self.write(text)
+
+    def stage_finished(self, stage, measurement, error=None):
+        if not self.stages:
+            return
+        event = stage_event(stage, measurement, error)
+        throughput = f" ({event['rows_per_second']:,.0f} filas/s)" if event['rows_per_second'] else ''
+        status = f" con error: {event['error']}" if error else ''
+        self.write(f"[{stage}] {event['seconds']:.3f}s, {event['rows']} filas{throughput}, {event['db_queries']} consultas{status}")
+
+
+class JSONReportHook(ETLHook):
+    def __init__(self):
+        self.started = time.time()
+        self.events = []
+        self.open_stages = {}
+
+    def stage_started(self, stage):
+        self.open_stages.setdefault(stage, []).append(time.time())
+
+    def stage_finished(self, stage, measurement, error=None):
+        event = stage_event(stage, measurement, error)
+        event['started_at'] = self.open_stages[stage].pop()
+        self.events.append(event)
+
+    def report(self):
+        totals = {}
+        for event in self.events:
+            total = totals.setdefault(event['stage'], {'runs': 0, 'seconds': 0.0, 'rows': 0, 'db_queries': 0})
+            total['runs'] += 1
+            total['seconds'] = round(total['seconds'] + event['seconds'], 6)
+            total['rows'] += event['rows']
+            total['db_queries'] += event['db_queries']
+        return {'started_at': self.started, 'seconds': round(time.time() - self.started, 6), 'stages': totals, 'events': self.events}
+
+    def write(self, path):
+        Path(path).write_text(json.dumps(self.report(), indent=2))
+
+
+class ProfilerHook(ETLHook):
+    def __init__(self, directory, profiler='cprofile'):
+        self.directory = Path(directory)
+        self.profiler = profiler
+        self.active = []
+        self.runs = 0
+        if profiler == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise ImportError('Para perfilar con pyinstrument instálelo: python -m pip install pyinstrument')
+        elif profiler != 'cprofile':
+            raise ValueError(f"Profiler no soportado: {profiler}")
+
+    def stage_started(self, stage):
+        # solo se perfila la etapa exterior; los profilers no se pueden anidar
+        if self.active:
+            self.active.append(None)
+            return
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self.active.append(profiler)
+
+    def stage_finished(self, stage, measurement, error=None):
+        profiler = self.active.pop()
+        if profiler is None:
+            return
+        self.runs += 1
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{self.runs:02d}_{stage}"
+        if self.profiler == 'pyinstrument':
+            profiler.stop()
+            (self.directory / f"{name}.html").write_text(profiler.output_html())
+        else:
+            profiler.disable()
+            profiler.dump_stats(self.directory / f"{name}.prof")
@@ -0,0 +1,78 @@
+import csv
+import json
+from pathlib import Path
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = 1000
+EXCEL_SUFFIXES = ('.xlsx', '.xlsm')
+
+
+def parse_trades(stream, suffix):
+    if suffix == '.csv':
+        return list(csv.DictReader(stream))
+    if suffix in ('.jsonl', '.ndjson'):
+        return [json.loads(line) for line in stream if line.strip()]
+    if suffix == '.json':
+        return json.load(stream)
+    raise ValueError(f"Formato de transacciones no soportado: {suffix}")
+
+
+def read_trades(path):
+    with open(path, encoding='utf-8', newline='') as stream:
+        return parse_trades(stream, Path(path).suffix.lower())
+
+
+def file_suffix(path):
+    suffix = Path(path).suffix.lower()
+    if suffix not in EXCEL_SUFFIXES + ('.csv', '.parquet'):
+        raise ValueError(f"Formato de archivo no soportado: {suffix}")
+    return suffix
+
+
+def read_weights(path, sheet_name='Weights'):
+    suffix = file_suffix(path)
+    if suffix in EXCEL_SUFFIXES:
+        return pd.read_excel(path, sheet_name=sheet_name)
+    if suffix == '.csv':
+        return pd.read_csv(path)
+    return pd.read_parquet(path)
+
+
+def iter_excel_rows(path, sheet_name, chunk_size):
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+
+def iter_parquet_rows(path, chunk_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Para leer archivos Parquet instale pyarrow: python -m pip install pyarrow')
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pandas()
+
+
+def iter_price_batches(path, chunk_size=DEFAULT_CHUNK_SIZE, sheet_name='Precios'):
+    suffix = file_suffix(path)
+    if suffix in EXCEL_SUFFIXES:
+        yield from iter_excel_rows(path, sheet_name, chunk_size)
+    elif suffix == '.csv':
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    else:
+        yield from iter_parquet_rows(path, chunk_size)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import PortfolioHolding
+from .models import Job, PortfolioHolding
 
 
 class PortfolioHoldingSerializer(serializers.ModelSerializer):
@@ -15,3 +15,12 @@ class PortfolioValueSerializer(serializers.Serializer):
     date = serializers.DateField()
     portfolio_name = serializers.CharField()
     total_value = serializers.DecimalField(max_digits=15, decimal_places=2)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'params', 'portfolios', 'status', 'progress', 'result', 'error', 'attempts', 'max_attempts',
+            'cancel_requested', 'worker', 'run_after', 'created_at', 'started_at', 'finished_at', 'heartbeat_at'
+        ]
@@ -0,0 +1,221 @@
+import shutil
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+import numpy as np
+import openpyxl
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from .analytics import series_analytics
+from .etl import PortfolioETL
+from .fingerprints import excel_sheet_digest
+from .fixedpoint import PRICE_SCALE, QUANTITY_SCALE, check_range, compute_fixed, to_units
+from .holdings import AMOUNT_STEP, NUMERIC_BACKENDS, WEIGHT_STEP
+from .models import Asset, AssetPrice, Job, Portfolio, PortfolioHolding, PortfolioValue, PortfolioWeight, Transaction
+
+START = date(2023, 1, 2)
+
+
+def day(n):
+    return START + timedelta(days=n)
+
+
+@override_settings(PRICE_STORE_DIR='', PRICE_STALENESS_DAYS=5)
+class IncrementalRecalculationTests(TestCase):
+    def setUp(self):
+        self.portfolio = Portfolio.objects.create(name='Portfolio 1')
+        self.assets = [Asset.objects.create(symbol=symbol, name=symbol) for symbol in ('EEUU', 'Europa', 'Asia')]
+        for asset, weight in zip(self.assets, ('0.400000', '0.350000', '0.250000')):
+            PortfolioWeight.objects.create(portfolio=self.portfolio, asset=asset, weight=Decimal(weight))
+
+    def add_prices(self, first, last):
+        prices = []
+        for n in range(first, last):
+            for j, asset in enumerate(self.assets):
+                # Asia queda sin precio más allá del límite de antigüedad entre los días 10 y 24
+                if asset.symbol == 'Asia' and 10 <= n < 25:
+                    continue
+                prices.append(AssetPrice(asset=asset, date=day(n), price=Decimal(100 + 10 * j + n) + Decimal('0.1234')))
+        AssetPrice.objects.bulk_create(prices)
+
+    def snapshot(self):
+        holdings = sorted(PortfolioHolding.objects.values_list('portfolio_id', 'asset_id', 'date', 'quantity', 'amount', 'weight'))
+        values = sorted(PortfolioValue.objects.values_list('portfolio_id', 'date', 'total_value'))
+        return holdings, values
+
+    def test_incremental_matches_full_rebuild(self):
+        self.add_prices(0, 20)
+        Transaction.objects.create(
+            portfolio=self.portfolio,
+            asset=self.assets[2],
+            date=day(12),
+            transaction_type='BUY',
+            amount=Decimal('1000000.00'),
+            quantity=Decimal('7000.000000')
+        )
+        PortfolioETL(hooks=[]).calculate_holdings(with_transactions=True)
+        self.assertFalse(PortfolioHolding.objects.filter(asset=self.assets[2], date=day(19)).exists())
+
+        self.add_prices(20, 30)
+        PortfolioETL(hooks=[]).recalculate_from(day(20))
+        incremental = self.snapshot()
+        PortfolioETL(hooks=[]).calculate_holdings(with_transactions=True)
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(
+            PortfolioHolding.objects.get(asset=self.assets[2], date=day(29)).quantity,
+            PortfolioHolding.objects.get(asset=self.assets[2], date=day(9)).quantity + Decimal('7000.000000')
+        )
+
+
+class SheetDigestTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def workbook(self, name, strings):
+        # libro mínimo con tabla de textos compartidos: Weights usa los índices 0-1 y Notas el 2
+        ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+        rel = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+        sheets = {'Weights': '<c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c><c r="C1"><v>0.5</v></c>', 'Notas': '<c r="A1" t="s"><v>2</v></c>'}
+        path = self.directory / name
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('xl/workbook.xml', f'<workbook xmlns="{ns}" xmlns:r="{rel}"><sheets>' + ''.join(
+                f'<sheet name="{sheet}" sheetId="{i}" r:id="rId{i}"/>' for i, sheet in enumerate(sheets, 1)
+            ) + '</sheets></workbook>')
+            archive.writestr('xl/_rels/workbook.xml.rels', '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">' + ''.join(
+                f'<Relationship Id="rId{i}" Target="worksheets/sheet{i}.xml"/>' for i in range(1, len(sheets) + 1)
+            ) + '</Relationships>')
+            for i, cells in enumerate(sheets.values(), 1):
+                archive.writestr(f'xl/worksheets/sheet{i}.xml', f'<worksheet xmlns="{ns}"><sheetData><row r="1">{cells}</row></sheetData></worksheet>')
+            archive.writestr('xl/sharedStrings.xml', f'<sst xmlns="{ns}">' + ''.join(f'<si><t>{text}</t></si>' for text in strings) + '</sst>')
+        return path
+
+    def test_strings_of_other_sheets_do_not_change_the_digest(self):
+        first = self.workbook('a.xlsx', ['Asset', 'EEUU', 'borrador'])
+        second = self.workbook('b.xlsx', ['Asset', 'EEUU', 'versión final'])
+        renamed = self.workbook('c.xlsx', ['Asset', 'Europa', 'borrador'])
+        self.assertEqual(excel_sheet_digest(first, 'Weights'), excel_sheet_digest(second, 'Weights'))
+        self.assertNotEqual(excel_sheet_digest(first, 'Notas'), excel_sheet_digest(second, 'Notas'))
+        self.assertNotEqual(excel_sheet_digest(first, 'Weights'), excel_sheet_digest(renamed, 'Weights'))
+
+
+@override_settings(PRICE_STORE_DIR='')
+class IncrementalLoadTests(TestCase):
+    def test_resaved_workbook_does_not_rebuild_holdings(self):
+        source = Path(settings.BASE_DIR) / 'data' / 'datos.xlsx'
+        PortfolioETL(str(source), hooks=[]).load_data()
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory)
+        # volver a guardar reescribe todas las hojas y la tabla de textos sin cambiar ningún peso ni precio
+        resaved = directory / 'datos.xlsx'
+        book = openpyxl.load_workbook(source)
+        book.create_sheet('Notas').append(['revisado'])
+        book.save(resaved)
+        with mock.patch.object(PortfolioETL, 'calculate_holdings') as rebuild:
+            changed_dates = PortfolioETL(str(resaved), hooks=[]).load_data(incremental=True)
+        rebuild.assert_not_called()
+        self.assertEqual(changed_dates, [])
+
+
+def decimal_reference(quantities, prices):
+    q_units, q_present = to_units(quantities, QUANTITY_SCALE)
+    p_units, p_present = to_units(prices, PRICE_SCALE)
+    present = q_present & p_present
+    cents = np.zeros(q_units.shape, dtype='int64')
+    weights = np.zeros(q_units.shape, dtype='int64')
+    totals = np.zeros(q_units.shape[0], dtype='int64')
+    for i in range(q_units.shape[0]):
+        amounts = {
+            j: (Decimal(int(q_units[i, j])).scaleb(-6) * Decimal(int(p_units[i, j])).scaleb(-4)).quantize(AMOUNT_STEP)
+            for j in np.flatnonzero(present[i])
+        }
+        total = sum(amounts.values(), Decimal('0'))
+        totals[i] = int(total.scaleb(2))
+        for j, amount in amounts.items():
+            cents[i, j] = int(amount.scaleb(2))
+            if total:
+                weights[i, j] = int((amount / total).quantize(WEIGHT_STEP).scaleb(6))
+    return q_units, cents, present, totals, weights
+
+
+def synthetic_case(rng, dates, assets):
+    q_units = rng.integers(0, 10 ** 12, size=(dates, assets))
+    p_units = rng.integers(1, 10 ** 8, size=(dates, assets))
+    # celdas con empate exacto en el centavo: p = 0.5 y q = 0.02 * m + 0.01
+    ties = rng.random((dates, assets)) < 0.2
+    q_units = np.where(ties, rng.integers(0, 10 ** 8, size=(dates, assets)) * 20000 + 10000, q_units)
+    p_units = np.where(ties, 5000, p_units)
+    prices = p_units / PRICE_SCALE
+    prices[rng.random((dates, assets)) < 0.05] = np.nan
+    return q_units / QUANTITY_SCALE, prices
+
+
+class NumericParityTests(SimpleTestCase):
+    def assertMatchesDecimal(self, quantities, prices):
+        expected = decimal_reference(quantities, prices)
+        for backend, compute in NUMERIC_BACKENDS.items():
+            for name, want, got in zip(('quantity', 'amount', 'present', 'total', 'weight'), expected, compute(quantities, prices)):
+                np.testing.assert_array_equal(got, want, err_msg=f"{backend}: {name}")
+
+    def test_half_cent_ties_round_half_even(self):
+        quantities = np.array([[0.01, 0.03, 0.05, 2.07]])
+        prices = np.full((1, 4), 0.5)
+        self.assertMatchesDecimal(quantities, prices)
+        # 0.005 -> 0.00, 0.015 -> 0.02, 0.025 -> 0.02, 1.035 -> 1.04
+        np.testing.assert_array_equal(compute_fixed(quantities, prices)[1], [[0, 2, 2, 104]])
+
+    def test_large_positions_do_not_overflow(self):
+        # 200 mil millones en una posición: cents * 1e6 ya no cabe en int64
+        self.assertMatchesDecimal(np.array([[2e8, 1.0]]), np.array([[1000.0, 1.0]]))
+        self.assertMatchesDecimal(np.array([[9.99e8, 3.333333, 1e-6]]), np.array([[9999.9999, 7.7777, 0.5]]))
+
+    def test_large_quantity_and_price_in_different_assets(self):
+        self.assertMatchesDecimal(np.array([[9e8, 1.0]]), np.array([[1.0, 9e7]]))
+
+    def test_out_of_range_products_raise(self):
+        with self.assertRaises(OverflowError):
+            check_range(np.array([[2 ** 40]]), np.array([[2 ** 30]]))
+        with self.assertRaises(OverflowError):
+            compute_fixed(np.array([[1e12]]), np.array([[1e10]]))
+
+    def test_synthetic_matrices_match_decimal(self):
+        rng = np.random.default_rng(0)
+        for _ in range(20):
+            self.assertMatchesDecimal(*synthetic_case(rng, 200, 30))
+
+
+class AnalyticsTests(SimpleTestCase):
+    def series(self, dates):
+        values = 100 * np.cumprod(1 + np.where(np.arange(len(dates)) % 2, 0.01, -0.005))
+        return series_analytics(dates, values, window=5)
+
+    def test_calendar_daily_series_annualizes_with_365_periods(self):
+        result = self.series([day(n) for n in range(366)])
+        self.assertEqual(result['periods_per_year'], 365)
+        self.assertAlmostEqual(result['volatility'], result['daily_volatility'] * np.sqrt(365), places=6)
+
+    def test_business_day_series_annualizes_with_business_days(self):
+        dates = [d for d in (day(n) for n in range(366)) if d.weekday() < 5]
+        self.assertAlmostEqual(self.series(dates)['periods_per_year'], 260, delta=1)
+
+
+class JobDataFileTests(TestCase):
+    def post(self, params):
+        return APIClient().post('/api/jobs/', {'kind': 'load_data', 'params': params}, format='json')
+
+    def test_load_data_accepts_files_inside_the_data_directory(self):
+        response = self.post({'excel_file': 'datos.xlsx'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().params['excel_file'], 'datos.xlsx')
+
+    def test_load_data_rejects_paths_outside_the_data_directory(self):
+        for name in ('/etc/passwd', '../manage.py', str(Path(settings.BASE_DIR) / 'manage.py'), 'no_existe.xlsx'):
+            response = self.post({'excel_file': name})
+            self.assertEqual(response.status_code, 400, name)
+        response = self.post({'excel_file': 'datos.xlsx', 'weights_file': '../requirements.txt'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
@@ -4,6 +4,16 @@ from . import views
 urlpatterns = [
     path('api/weights/', views.portfolio_weights, name='portfolio_weights'),
     path('api/values/', views.portfolio_values, name='portfolio_values'),
+    path('api/async/weights/', views.portfolio_weights_async, name='portfolio_weights_async'),
+    path('api/async/values/', views.portfolio_values_async, name='portfolio_values_async'),
+    path('api/analytics/', views.analytics, name='analytics'),
+    path('api/prices/', views.asset_prices, name='asset_prices'),
+    path('api/transactions/batch/', views.transactions_batch, name='transactions_batch'),
+    path('api/jobs/', views.job_list, name='job_list'),
+    path('api/jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('api/jobs/<int:job_id>/<str:action>/', views.job_action, name='job_action'),
+    path('api/export/<str:kind>/', views.export, name='export'),
+    path('api/metrics/', views.metrics, name='metrics'),
     path('api/test/data/', views.test_data, name='test_data'),
     path('api/test/ports/', views.test_ports, name='test_ports'),
     path('dashboard/', views.dashboard, name='dashboard'),
@@ -0,0 +1,66 @@
+from bisect import bisect_right
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from .holdings import initial_book
+from .prices import PriceMatrix, as_of_prices
+from .models import Transaction
+
+
+class ValuationIndex:
+    def __init__(self, portfolio, initial_quantities, transactions):
+        self.portfolio = portfolio
+        self.asset_ids = sorted(initial_quantities)
+        self.event_dates = []
+        self.snapshots = []
+        quantities = dict(initial_quantities)
+        for t in transactions:
+            if t.asset_id not in quantities:
+                continue
+            if t.transaction_type == 'BUY':
+                quantities[t.asset_id] += t.quantity
+            else:
+                quantities[t.asset_id] -= t.quantity
+            if self.event_dates and self.event_dates[-1] == t.date:
+                self.snapshots[-1] = dict(quantities)
+            else:
+                self.event_dates.append(t.date)
+                self.snapshots.append(dict(quantities))
+        self.initial_quantities = dict(initial_quantities)
+        self.matrix = np.array(
+            [[float(initial_quantities[aid]) for aid in self.asset_ids]]
+            + [[float(snapshot[aid]) for aid in self.asset_ids] for snapshot in self.snapshots],
+            dtype='float64'
+        ).reshape(len(self.snapshots) + 1, len(self.asset_ids))
+
+    @classmethod
+    def build(cls, portfolio):
+        # la valoración usa C_i,0 sin redondear, a partir del peso y precio de inicio registrados
+        initial_quantities = {
+            asset_id: (row.weight * portfolio.initial_value) / row.inception_price
+            for asset_id, row in initial_book(portfolio).items()
+        }
+        transactions = Transaction.objects.filter(portfolio=portfolio).order_by('date', 'id').only(
+            'asset_id', 'date', 'transaction_type', 'quantity'
+        )
+        return cls(portfolio, initial_quantities, transactions)
+
+    def quantities_at(self, date):
+        position = bisect_right(self.event_dates, date)
+        if position == 0:
+            return self.initial_quantities
+        return self.snapshots[position - 1]
+
+    def value(self, date):
+        quantities = self.quantities_at(date)
+        total_value = Decimal('0')
+        for asset_id, (price, _) in as_of_prices(self.asset_ids, date).items():
+            total_value += quantities[asset_id] * price
+        return total_value
+
+    def values(self, prices=None):
+        prices = prices if prices is not None else PriceMatrix.load()
+        frame = prices.window(self.asset_ids)
+        positions = np.searchsorted(pd.to_datetime(self.event_dates).values, pd.to_datetime(frame.index).values, side='right')
+        amounts = self.matrix[positions] * frame.to_numpy(dtype='float64')
+        return pd.Series(np.nansum(amounts, axis=1), index=frame.index, name=self.portfolio.name)
@@ -1,49 +1,266 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from django.db.models import Sum
-from .models import PortfolioHolding, Asset, Portfolio, AssetPrice, Transaction
-from .serializers import PortfolioHoldingSerializer
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from .models import PortfolioHolding, PortfolioValue, Asset, Portfolio, AssetPrice, Transaction, Job
+from .serializers import JobSerializer, PortfolioHoldingSerializer
+from .pagination import HoldingKeysetPagination
+from .cache import acached_api, cached_api
+from .metrics import record_rows, render_prometheus, timed_serialization
+from .prices import as_of_prices
+from .analytics import portfolio_analytics
+from .columnar import COLUMNAR_RENDERERS, columnar_values, columnar_weights, is_columnar
+from .etl import PortfolioETL
+from .export import EXPORT_FORMATS, parse_date, stream_export
+from . import jobs
+from .readers import parse_trades
 from datetime import datetime
+from pathlib import Path
+import io
 import socket
 import subprocess
 
 
-@api_view(['GET'])
-def portfolio_weights(request):
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    holdings = PortfolioHolding.objects.all()
+def holdings_queryset(params):
+    fecha_inicio = params.get('fecha_inicio')
+    fecha_fin = params.get('fecha_fin')
+    holdings = PortfolioHolding.objects.select_related('asset', 'portfolio').only(
+        'date', 'quantity', 'amount', 'weight', 'asset__symbol', 'portfolio__name'
+    )
     if fecha_inicio:
         holdings = holdings.filter(date__gte=datetime.strptime(fecha_inicio, '%Y-%m-%d').date())
     if fecha_fin:
         holdings = holdings.filter(date__lte=datetime.strptime(fecha_fin, '%Y-%m-%d').date())
-    serializer = PortfolioHoldingSerializer(holdings, many=True)
-    return Response(serializer.data)
+    if params.get('portfolio'):
+        holdings = holdings.filter(portfolio__name=params['portfolio'])
+    if params.get('asset'):
+        holdings = holdings.filter(asset__symbol=params['asset'])
+    return holdings
 
 
-@api_view(['GET'])
-def portfolio_values(request):
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    holdings = PortfolioHolding.objects.values('date', 'portfolio__name').annotate(
-        total_value=Sum('amount')
-    ).order_by('date', 'portfolio__name')
+def columnar_holdings(holdings):
+    return holdings.annotate(
+        weight_value=Cast('weight', FloatField()),
+        amount_value=Cast('amount', FloatField())
+    ).values_list('date', 'portfolio__name', 'asset__symbol', 'weight_value', 'amount_value')
+
+
+def values_queryset(params):
+    fecha_inicio = params.get('fecha_inicio')
+    fecha_fin = params.get('fecha_fin')
+    values = PortfolioValue.objects.annotate(value=Cast('total_value', FloatField())).order_by('date', 'portfolio__name')
     if fecha_inicio:
-        holdings = holdings.filter(date__gte=datetime.strptime(fecha_inicio, '%Y-%m-%d').date())
+        values = values.filter(date__gte=datetime.strptime(fecha_inicio, '%Y-%m-%d').date())
     if fecha_fin:
-        holdings = holdings.filter(date__lte=datetime.strptime(fecha_fin, '%Y-%m-%d').date())
+        values = values.filter(date__lte=datetime.strptime(fecha_fin, '%Y-%m-%d').date())
+    return values
+
+
+def values_data(rows):
     data = [
         {
             'date': item['date'],
             'portfolio_name': item['portfolio__name'],
-            'total_value': item['total_value']
+            'total_value': item['value']
         }
-        for item in holdings
+        for item in rows
     ]
+    record_rows(len(data))
+    return data
+
+
+def json_response(data, status=200):
+    with timed_serialization():
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+@cached_api
+@api_view(['GET'])
+@renderer_classes(COLUMNAR_RENDERERS)
+def portfolio_weights(request):
+    holdings = holdings_queryset(request.GET)
+    if is_columnar(request):
+        return Response(columnar_weights(columnar_holdings(holdings)))
+    paginator = HoldingKeysetPagination()
+    page = paginator.paginate_queryset(holdings, request)
+    record_rows(len(page))
+    with timed_serialization():
+        data = PortfolioHoldingSerializer(page, many=True).data
+    return paginator.get_paginated_response(data)
+
+
+@cached_api
+@api_view(['GET'])
+@renderer_classes(COLUMNAR_RENDERERS)
+def portfolio_values(request):
+    values = values_queryset(request.GET)
+    if is_columnar(request):
+        return Response(columnar_values(values.values_list('date', 'portfolio__name', 'value')))
+    return Response(values_data(values.values('date', 'portfolio__name', 'value')))
+
+
+@acached_api
+async def portfolio_weights_async(request):
+    holdings = holdings_queryset(request.GET)
+    if request.GET.get('format') == 'columnar':
+        return json_response(columnar_weights([row async for row in columnar_holdings(holdings)]))
+    paginator = HoldingKeysetPagination()
+    try:
+        page = await paginator.apaginate_queryset(holdings, request)
+    except NotFound as e:
+        return json_response({'detail': e.detail}, status=e.status_code)
+    record_rows(len(page))
+    with timed_serialization():
+        data = PortfolioHoldingSerializer(page, many=True).data
+    return json_response(paginator.paginated_data(data))
+
+
+@acached_api
+async def portfolio_values_async(request):
+    values = values_queryset(request.GET)
+    if request.GET.get('format') == 'columnar':
+        return json_response(columnar_values([row async for row in values.values_list('date', 'portfolio__name', 'value')]))
+    return json_response(values_data([row async for row in values.values('date', 'portfolio__name', 'value')]))
+
+
+@cached_api
+@api_view(['GET'])
+def asset_prices(request):
+    fecha = request.GET.get('fecha')
+    date = datetime.strptime(fecha, '%Y-%m-%d').date() if fecha else AssetPrice.objects.latest('date').date
+    assets = Asset.objects.order_by('symbol')
+    if request.GET.get('asset'):
+        assets = assets.filter(symbol=request.GET['asset'])
+    symbols = dict(assets.values_list('id', 'symbol'))
+    prices = as_of_prices(list(symbols), date)
+    data = [
+        {
+            'date': date,
+            'asset_name': symbol,
+            'price': prices[asset_id][0],
+            'price_date': prices[asset_id][1],
+            'stale': prices[asset_id][1] != date
+        }
+        for asset_id, symbol in symbols.items()
+        if asset_id in prices
+    ]
+    record_rows(len(data))
     return Response(data)
 
 
+@cached_api
+@api_view(['GET'])
+def analytics(request):
+    try:
+        window = int(request.GET.get('window', settings.ANALYTICS_WINDOW))
+    except ValueError:
+        window = 0
+    if window < 2:
+        return Response({'success': False, 'message': 'window debe ser un entero mayor o igual a 2'}, status=400)
+    values = values_queryset(request.GET)
+    if request.GET.get('portfolio'):
+        values = values.filter(portfolio__name=request.GET['portfolio'])
+    return Response({
+        'window': window,
+        'periods_per_year': settings.ANALYTICS_PERIODS_PER_YEAR,
+        'risk_free_rate': settings.ANALYTICS_RISK_FREE_RATE,
+        'portfolios': portfolio_analytics(
+            values.values_list('date', 'portfolio__name', 'value'),
+            window,
+            include_series=bool(request.GET.get('series'))
+        )
+    })
+
+
+@api_view(['POST'])
+def transactions_batch(request):
+    uploaded = request.FILES.get('file')
+    try:
+        if uploaded:
+            stream = io.TextIOWrapper(uploaded.file, encoding='utf-8', newline='')
+            trades = parse_trades(stream, Path(uploaded.name).suffix.lower())
+        elif isinstance(request.data, list):
+            trades = request.data
+        else:
+            trades = request.data.get('trades', [])
+        if request.GET.get('background'):
+            job = jobs.enqueue('process_transactions', {'trades': trades})
+            return Response(JobSerializer(job).data, status=202)
+        transactions = PortfolioETL().process_transactions(trades)
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=400)
+    return Response({
+        'success': True,
+        'message': f"Transacciones procesadas: {len(transactions)}",
+        'transactions': len(transactions)
+    })
+
+
+@api_view(['GET', 'POST'])
+def job_list(request):
+    if request.method == 'POST':
+        try:
+            job = jobs.enqueue(request.data.get('kind'), request.data.get('params'), request.data.get('max_attempts'))
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=400)
+        return Response(JobSerializer(job).data, status=202)
+    queryset = Job.objects.order_by('-id')
+    if request.GET.get('status'):
+        queryset = queryset.filter(status=request.GET['status'].upper())
+    return Response(JobSerializer(queryset[:100], many=True).data)
+
+
+@api_view(['GET'])
+def job_detail(request, job_id):
+    try:
+        return Response(JobSerializer(Job.objects.get(pk=job_id)).data)
+    except Job.DoesNotExist:
+        return Response({'success': False, 'message': 'Job no encontrado'}, status=404)
+
+
+@api_view(['POST'])
+def job_action(request, job_id, action):
+    try:
+        if action == 'cancel':
+            jobs.cancel(job_id)
+        elif action == 'retry':
+            jobs.retry(job_id)
+        else:
+            return Response({'success': False, 'message': f"Acción desconocida: {action}"}, status=400)
+    except Job.DoesNotExist:
+        return Response({'success': False, 'message': 'Job no encontrado'}, status=404)
+    except ValueError as e:
+        return Response({'success': False, 'message': str(e)}, status=409)
+    return Response(JobSerializer(Job.objects.get(pk=job_id)).data)
+
+
+def export(request, kind):
+    export_format = request.GET.get('format', 'ndjson')
+    try:
+        chunks = stream_export(
+            kind,
+            export_format,
+            fecha_inicio=parse_date(request.GET.get('fecha_inicio')),
+            fecha_fin=parse_date(request.GET.get('fecha_fin')),
+            portfolio=request.GET.get('portfolio'),
+            asset=request.GET.get('asset')
+        )
+    except (ValueError, ImportError) as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{export_format}"'
+    return response
+
+
+def metrics(request):
+    return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def dashboard(request):
     return render(request, 'dashboard.html')
 
@@ -0,0 +1,340 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_management.settings')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark del ETL, recálculo y API con datos sintéticos')
+    parser.add_argument('--assets', type=int, default=17)
+    parser.add_argument('--portfolios', type=int, default=2)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--transactions', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--trace-memory', action='store_true', help='Pico de memoria por operación con tracemalloc (agrega overhead al tiempo)')
+    parser.add_argument('--explain', action='store_true', help='Guardar el plan de ejecución de las consultas principales')
+    parser.add_argument('--without-indexes', action='store_true', help='Eliminar los índices compuestos para comparar planes')
+    parser.add_argument('--readers', type=int, default=0, help='Hilos lectores de la API concurrentes con un recálculo completo')
+    parser.add_argument('--output', type=str, default=None, help='Archivo JSON de resultados')
+    parser.add_argument('--compare', type=str, default=None, help='JSON de una corrida anterior para comparar tiempos')
+    return parser.parse_args()
+
+
+def column_label(index):
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(65 + remainder) + label
+    return label
+
+
+def create_workbook(path, assets, portfolios, years, seed):
+    rng = np.random.default_rng(seed)
+    symbols = [f"ACT{i:03d}" for i in range(assets)]
+    names = [f"Portfolio {i + 1}" for i in range(portfolios)]
+    weights = {'A': [''] + symbols, 'B': ['Asset'] + symbols}
+    for i, name in enumerate(names):
+        weights[column_label(i + 2)] = [name] + list(rng.dirichlet(np.ones(assets)))
+    dates = pd.date_range(date(2020, 1, 1), periods=int(365 * years) + 1, freq='D')
+    returns = rng.normal(0, 0.02, size=(len(dates), assets))
+    prices = np.maximum(rng.uniform(50, 500, assets) * np.cumprod(1 + returns, axis=0), 1)
+    prices_df = pd.DataFrame(prices, columns=symbols)
+    prices_df.insert(0, 'Date', dates)
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(weights).to_excel(writer, sheet_name='Weights', index=False)
+        prices_df.to_excel(writer, sheet_name='Precios', index=False)
+    return symbols, names, [d.date() for d in dates]
+
+
+def create_trades(count, symbols, names, dates, seed):
+    rng = np.random.default_rng(seed + 1)
+    trades = []
+    for _ in range(count):
+        portfolio = names[rng.integers(len(names))]
+        sell, buy = rng.choice(symbols, size=2, replace=False)
+        trade_date = dates[rng.integers(len(dates) // 2, len(dates))]
+        amount = round(float(rng.uniform(1e5, 1e7)), 2)
+        trades.append({'portfolio': portfolio, 'asset': sell, 'transaction_type': 'SELL', 'amount': amount, 'date': trade_date})
+        trades.append({'portfolio': portfolio, 'asset': buy, 'transaction_type': 'BUY', 'amount': amount, 'date': trade_date})
+    return trades
+
+
+def query_label(url):
+    if 'columnar' in url:
+        return 'columnar '
+    if 'portfolio=' in url:
+        return 'portfolio '
+    return ''
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def drop_indexes():
+    from django.db import connection
+    from portfolios.models import AssetPrice, PortfolioHolding, PortfolioValue, Transaction
+    with connection.schema_editor() as schema_editor:
+        for model in (AssetPrice, PortfolioHolding, PortfolioValue, Transaction):
+            for index in model._meta.indexes:
+                schema_editor.remove_index(model, index)
+
+
+def hot_queries(first, middle, last):
+    from portfolios.models import AssetPrice, InitialQuantity, Portfolio, PortfolioHolding, PortfolioValue, Transaction
+    from portfolios.pagination import HoldingKeysetPagination
+    portfolio = Portfolio.objects.order_by('id').first()
+    holdings = PortfolioHolding.objects.select_related('asset', 'portfolio').filter(date__gte=first, date__lte=last)
+    ordering = HoldingKeysetPagination.ordering
+    cursor = PortfolioHolding.objects.filter(date=middle).order_by(*ordering).first()
+    return {
+        'weights_first_page': holdings.order_by(*ordering)[:101],
+        'weights_cursor_page': HoldingKeysetPagination().after(
+            holdings.order_by(*ordering), (cursor.date, cursor.portfolio_id, cursor.asset_id)
+        )[:101],
+        'values_range': PortfolioValue.objects.filter(date__gte=middle, date__lte=last).order_by('date', 'portfolio__name'),
+        'holdings_previous_date': PortfolioHolding.objects.filter(portfolio=portfolio, date__lt=middle).order_by('-date').values('date')[:1],
+        'holdings_from_date': PortfolioHolding.objects.filter(portfolio=portfolio, date__gte=middle).values_list('date', 'asset_id', 'quantity'),
+        'latest_price_date': AssetPrice.objects.order_by('-date').values('date')[:1],
+        'portfolio_transactions': Transaction.objects.filter(portfolio=portfolio).order_by('date', 'id'),
+        'initial_book': InitialQuantity.objects.filter(portfolio=portfolio),
+    }
+
+
+class Recorder:
+    def __init__(self, trace_memory):
+        self.trace_memory = trace_memory
+        self.results = []
+
+    def run(self, name, operation):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = operation()
+            seconds = time.perf_counter() - start
+        self.results.append({
+            'name': name,
+            'seconds': round(seconds, 6),
+            'queries': len(queries),
+            'peak_traced_kb': tracemalloc.get_traced_memory()[1] // 1024 if self.trace_memory else None,
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        })
+        print(f"{name:<40} {seconds:>10.4f}s {len(queries):>7} consultas")
+        return result
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * fraction))] * 1000, 2)
+
+
+def concurrent_reads(readers, urls, operation=None, seconds=None):
+    from django.db import connection
+    from django.test import Client
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    errors = []
+
+    def reader(index):
+        client = Client()
+        rng = random.Random(index)
+        count = 0
+        try:
+            while not stop.is_set():
+                count += 1
+                # parámetro único para que cada lectura llegue a la base y no a la caché
+                url = f"{rng.choice(urls)}&_={index}-{count}"
+                start = time.perf_counter()
+                try:
+                    ok = client.get(url).status_code == 200
+                except Exception as e:
+                    ok = False
+                    with lock:
+                        errors.append(str(e)[:200])
+                elapsed = time.perf_counter() - start
+                if ok:
+                    with lock:
+                        latencies.append(elapsed)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    try:
+        if operation is not None:
+            operation()
+        else:
+            time.sleep(seconds)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+    return {
+        'readers': readers,
+        'seconds': round(elapsed, 6),
+        'requests': len(latencies),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.5),
+        'p95_ms': percentile(latencies, 0.95)
+    }
+
+
+def compare(results, previous_path):
+    previous = {r['name']: r for r in json.loads(Path(previous_path).read_text())['results']}
+    print(f"\nComparación con {previous_path}")
+    for r in results:
+        before = previous.get(r['name'])
+        if before is None or not before['seconds']:
+            continue
+        change = (r['seconds'] - before['seconds']) / before['seconds'] * 100
+        print(f"{r['name']:<40} {before['seconds']:>10.4f}s -> {r['seconds']:>10.4f}s ({change:+.1f}%) consultas {before['queries']} -> {r['queries']}")
+
+
+def main():
+    args = parse_args()
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.core.cache import caches
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from portfolios.etl import PortfolioETL
+    from portfolios.readers import iter_price_batches, read_weights
+
+    workdir = Path(tempfile.mkdtemp(prefix='portfolio-bench-'))
+    workbook = workdir / 'datos.xlsx'
+    symbols, names, dates = create_workbook(workbook, args.assets, args.portfolios, args.years, args.seed)
+    trades = create_trades(args.transactions, symbols, names, dates, args.seed)
+    print(f"Datos sintéticos: {args.assets} activos, {args.portfolios} portafolios, {len(dates)} fechas, {len(trades)} transacciones en {workdir}")
+
+    setup_test_environment()
+    settings.PORTFOLIO_DATA_VERSION_FILE = workdir / '.data_version'
+    settings.PRICE_STORE_DIR = workdir / 'price_store'
+    settings.PRICE_VERSION_FILE = workdir / '.price_version'
+    original_name = connection.settings_dict['NAME']
+    connection.settings_dict['TEST']['NAME'] = str(workdir / 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    if args.without_indexes:
+        drop_indexes()
+    if args.trace_memory:
+        tracemalloc.start()
+
+    recorder = Recorder(args.trace_memory)
+    plans = {}
+    concurrency = {}
+    etl = PortfolioETL(str(workbook), workers=args.workers, hooks=[])
+    client = Client()
+    first, last = dates[0], dates[-1]
+    middle = dates[len(dates) // 2]
+    try:
+        recorder.run('etl.load_assets_and_weights', lambda: etl.load_assets_and_weights(read_weights(str(workbook))))
+        recorder.run('etl.load_prices', lambda: etl.load_price_batches(iter_price_batches(str(workbook), etl.chunk_size)))
+        recorder.run('etl.calculate_holdings', etl.calculate_holdings)
+        recorder.run('etl.process_transaction', lambda: etl.process_transaction(names[0], symbols[0], 1000000, symbols[1], 1000000, middle))
+        recorder.run('etl.process_transactions_batch', lambda: etl.process_transactions(trades))
+        recorder.run('etl.calculate_holdings_with_transactions', lambda: etl.calculate_holdings(with_transactions=True))
+        recorder.run('etl.load_incremental_first', lambda: etl.load_data(incremental=True))
+        recorder.run('etl.load_incremental_unchanged', lambda: etl.load_data(incremental=True))
+        for url in [
+            f"/api/values/?fecha_inicio={first}&fecha_fin={last}",
+            f"/api/values/?fecha_inicio={first}&fecha_fin={last}&format=columnar",
+            f"/api/weights/?fecha_inicio={first}&fecha_fin={last}",
+            f"/api/weights/?fecha_inicio={first}&fecha_fin={last}&format=columnar",
+            f"/api/weights/?fecha_inicio={middle}&fecha_fin={last}&portfolio={names[0]}",
+            f"/api/prices/?fecha={middle}",
+            f"/api/analytics/?fecha_inicio={first}&fecha_fin={last}",
+        ]:
+            for label in ('miss', 'hit'):
+                response = recorder.run(f"GET {url.split('?')[0]} {query_label(url)}{label}", lambda: client.get(url))
+                if response.status_code != 200:
+                    raise RuntimeError(f"{url}: HTTP {response.status_code}")
+            caches['api'].clear()
+        next_url = client.get(f"/api/weights/?fecha_inicio={middle}&fecha_fin={last}").json()['next']
+        recorder.run('GET /api/weights/ cursor', lambda: client.get(next_url))
+        if args.readers:
+            urls = [
+                f"/api/weights/?fecha_inicio={dates[i]}&fecha_fin={dates[min(i + 30, len(dates) - 1)]}&page_size=500"
+                for i in range(0, len(dates), 7)
+            ]
+            concurrency['idle'] = concurrent_reads(args.readers, urls, seconds=2)
+            concurrency['during_recalculation'] = concurrent_reads(
+                args.readers,
+                urls,
+                operation=lambda: recorder.run('etl.calculate_holdings under read load', lambda: etl.calculate_holdings(with_transactions=True))
+            )
+            for phase, stats in concurrency.items():
+                print(f"Lecturas {phase}: {stats['requests_per_second']} req/s, p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, errores {stats['errors']}")
+                if stats['first_error']:
+                    print(f"  {stats['first_error']}")
+        if args.explain:
+            plans = {name: queryset.explain() for name, queryset in hot_queries(first, middle, last).items()}
+            for name, plan in plans.items():
+                print(f"\n{name}\n{plan}")
+    finally:
+        connection.creation.destroy_test_db(original_name, verbosity=0)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'parameters': {
+            'assets': args.assets,
+            'portfolios': args.portfolios,
+            'years': args.years,
+            'dates': len(dates),
+            'transactions': len(trades),
+            'workers': args.workers,
+            'seed': args.seed,
+            'numeric_backend': settings.HOLDINGS_NUMERIC_BACKEND,
+            'database': connection.vendor,
+            'sqlite_pragmas': settings.SQLITE_PRAGMAS if connection.vendor == 'sqlite' else None,
+            'indexes': not args.without_indexes
+        },
+        'results': recorder.results,
+        'concurrency': concurrency,
+        'plans': plans
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Resultados guardados en {args.output}")
+    if args.compare:
+        compare(recorder.results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio_management.settings')
 django.setup()
 
 from portfolios.etl import PortfolioETL
-from portfolios.models import Portfolio, Asset, PortfolioHolding, AssetPrice, Transaction
+from portfolios.models import Portfolio, Asset, PortfolioHolding, PortfolioValue, AssetPrice, Transaction
 
 def safe_load_data(excel_file):
     print("🔄 Iniciando carga segura de datos...")
@@ -25,14 +25,14 @@ def safe_load_data(excel_file):
             fecha_inicial = initial_price.date
             p1 = Portfolio.objects.get(name='Portfolio 1')
             holdings_ini = PortfolioHolding.objects.filter(portfolio=p1, date=fecha_inicial)
-            total_ini = sum(h.amount for h in holdings_ini)
+            total_ini = PortfolioValue.objects.filter(portfolio=p1, date=fecha_inicial).values_list('total_value', flat=True).first() or 0
             print(f"📅 Fecha inicial: {fecha_inicial}")
             print(f"💰 Portafolio 1 V0: ${total_ini:,.2f}")
 
             for h in holdings_ini.order_by('asset__symbol')[:5]:
                 print(f"   {h.asset.symbol}: cantidad={h.quantity} monto=${h.amount:,.2f} peso={h.weight:.6f}")
 
-        print("\n💱 Procesando transacción (esto puede tomar unos minutos)...")
+        print("\n💱 Procesando transacción...")
         try:
             etl.process_transaction(
                 'Portfolio 1',
@@ -49,9 +49,8 @@ def safe_load_data(excel_file):
             return False
 
         fecha_tx = datetime(2022, 5, 15).date()
-        holdings_tx = PortfolioHolding.objects.filter(portfolio=p1, date=fecha_tx)
-        if holdings_tx.exists():
-            total_tx = sum(h.amount for h in holdings_tx)
+        total_tx = PortfolioValue.objects.filter(portfolio=p1, date=fecha_tx).values_list('total_value', flat=True).first()
+        if total_tx is not None:
             print(f"📅 Fecha transacción: {fecha_tx}")
             print(f"💰 Valor después de transacción: ${total_tx:,.2f}")
 